@@ -0,0 +1,34 @@
+class Clip:
+    """
+    One animation: frames shown frame_ms each, looping or holding the last.
+    Frames are finished surfaces (scaled, flipped), so playing is a lookup.
+    """
+    def __init__(self, frames, frame_ms, loop=True):
+        self.frames = tuple(frames)
+        self.frame_ms = frame_ms
+        self.loop = loop
+
+    def index(self, elapsed):
+        i = int(elapsed // self.frame_ms)
+        if self.loop:
+            return i % len(self.frames)
+        return min(i, len(self.frames) - 1)
+
+    def frame(self, elapsed):
+        return self.frames[self.index(elapsed)]
+
+
+class Animator:
+    """Plays clips from a (state, facing) table, restarting a clip when the state changes."""
+    def __init__(self, table, state, facing="r", now=0):
+        self.table = table
+        self.state = state
+        self.start = now
+        self.image = table[state, facing].frames[0]
+
+    def update(self, state, facing, now):
+        if state != self.state:
+            self.state = state
+            self.start = now
+        self.image = self.table[state, facing].frame(now - self.start)
+        return self.image
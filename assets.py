@@ -0,0 +1,241 @@
+import os
+import time
+import weakref
+
+import pygame
+from collections import OrderedDict, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+
+def _decode(path):
+    # Runs on the worker thread: file IO + PNG decode only, no display access
+    start = time.perf_counter()
+    surf = pygame.image.load(path)
+    return surf, (time.perf_counter() - start) * 1000
+
+
+def surface_bytes(surf):
+    """Pixel memory a surface holds itself, 0 for subsurfaces (their parent holds it)."""
+    if surf is None or surf.get_parent() is not None:
+        return 0
+    return surf.get_pitch() * surf.get_height()
+
+
+class AssetManager:
+    """
+    Loads images in the background.
+    PNGs are decoded on a worker thread, convert_alpha() happens on the
+    main thread (in pump() or get()), because it needs the display.
+    Paths found in a loaded atlas (see atlas.py) come from their sheet
+    instead: one decode per sheet, a subsurface view per sprite.
+
+    It is also the registry of what is resident. variant() hands out one
+    scaled/mirrored copy per (path, size, flip) to everyone who asks, e.g.
+    all obstacles of a type and size, for as long as anyone holds it: the
+    registry keeps weak references, so it never forgets a variant that is
+    still in memory and never keeps one alive itself. claim() records which owners (the
+    startup sprites, each level) use a path, release() unloads the paths
+    no other owner claimed, with their variants. Unclaimed paths stay
+    loaded. report() gives resident bytes and load time per path, also
+    for paths trimmed or unloaded since.
+    """
+    def __init__(self, workers=2, prepare=None, on_load=None):
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="assets")
+        self._pending = {}   # path -> Future
+        self._surfaces = {}  # path -> converted Surface (or None if it failed)
+        self._atlas = {}     # normalized path -> (sheet path, rect)
+        self._variants = weakref.WeakValueDictionary()  # (path, size, flip_x) -> Surface while in use
+        self._owners = defaultdict(set)  # path -> owners that claimed it
+        self.prepare = prepare           # finishes every variant, e.g. render.normalize
+        self.on_load = on_load           # on_load(path, error) once per decoded file, error None if it loaded
+        self.load_ms = defaultdict(float)  # path -> decode, convert and variant time, every load so far
+        self.errors = {}     # path -> exception
+
+    def load_atlas(self, entries):
+        """Serve sprites from atlas sheets, entries as returned by atlas.read_manifest()."""
+        self._atlas.update(entries)
+
+    def _source(self, path):
+        """The file that has to be decoded for path."""
+        entry = self._atlas.get(os.path.normpath(path))
+        return entry[0] if entry else path
+
+    def prefetch(self, paths):
+        """Queue paths for decoding, returns immediately."""
+        for path in paths:
+            if not path:
+                continue
+            path = self._source(path)
+            if path not in self._surfaces and path not in self._pending:
+                self._pending[path] = self._pool.submit(_decode, path)
+
+    def _finish(self, path):
+        future = self._pending.pop(path)
+        try:
+            surf, decode_ms = future.result()
+            start = time.perf_counter()
+            surf = surf.convert_alpha()
+            self.load_ms[path] += decode_ms + (time.perf_counter() - start) * 1000
+        except Exception as e:
+            self.errors[path] = e
+            surf = None
+        self._surfaces[path] = surf
+        if self.on_load:
+            self.on_load(path, self.errors.get(path))
+        return surf
+
+    def pump(self, max_items=None):
+        """Convert already decoded images, call once per frame from the main thread."""
+        done = [p for p, f in self._pending.items() if f.done()]
+        if max_items is not None:
+            done = done[:max_items]
+        for path in done:
+            self._finish(path)
+        return len(done)
+
+    def get(self, path):
+        """Converted surface for path, blocks if it is still being decoded. None on failure."""
+        if path in self._surfaces:
+            return self._surfaces[path]
+        entry = self._atlas.get(os.path.normpath(path))
+        if entry is not None:
+            sheet_path, rect = entry
+            sheet = self.get(sheet_path)
+            if sheet is None:
+                self.errors[path] = self.errors.get(sheet_path)
+            surf = self._surfaces[path] = sheet.subsurface(rect) if sheet else None
+            return surf
+        if path not in self._pending:
+            self.prefetch([path])
+        return self._finish(path)
+
+    def variant(self, path, size=None, flip_x=False):
+        """path scaled to size and/or mirrored, made once and shared. None if it failed to load."""
+        size = tuple(size) if size else None
+        key = (path, size, flip_x)
+        surf = self._variants.get(key)
+        if surf is not None:
+            return surf
+        surf = self.get(path)
+        if surf is None:
+            return None
+        start = time.perf_counter()
+        if size and size != surf.get_size():
+            surf = pygame.transform.scale(surf, size)
+        if flip_x:
+            surf = pygame.transform.flip(surf, True, False)
+        if self.prepare:
+            surf = self.prepare(surf)
+        self.load_ms[path] += (time.perf_counter() - start) * 1000
+        self._variants[key] = surf
+        return surf
+
+    def claim(self, owner, paths):
+        """Record that owner (any hashable, e.g. "level2") uses paths."""
+        for path in paths:
+            if path:
+                self._owners[path].add(owner)
+                self._owners[self._source(path)].add(owner)
+
+    def release(self, owner):
+        """Drop owner's claims, unload what nobody else claimed. Returns the unloaded paths."""
+        unloaded = []
+        for path, owners in list(self._owners.items()):
+            if owner in owners:
+                owners.discard(owner)
+                if not owners:
+                    del self._owners[path]
+                    self.unload(path)
+                    unloaded.append(path)
+        return unloaded
+
+    def unload(self, path):
+        """Forget path's surface and variants, the next get() loads it again."""
+        future = self._pending.pop(path, None)
+        if future:
+            future.cancel()
+        self._surfaces.pop(path, None)
+        self.errors.pop(path, None)
+        for key in [k for k in list(self._variants.keys()) if k[0] == path]:
+            self._variants.pop(key, None)
+
+    def trim(self, paths):
+        """
+        Drop the decoded sources of paths but keep their variants, e.g. once
+        every size the game draws is made. Atlas sheets go once none of
+        their sprites is left. Another variant() decodes the file again.
+        """
+        for path in paths:
+            self._surfaces.pop(path, None)
+        sheets = {self._source(p) for p in paths} - set(paths)
+        in_use = {self._source(p) for p in self._surfaces if p not in sheets}
+        for sheet in sheets - in_use:
+            self._surfaces.pop(sheet, None)
+
+    def report(self):
+        """
+        (path, resident bytes, load ms, owners) per path loaded so far,
+        largest first. Variants count towards their path, atlas sprites
+        count 0: their sheet holds the pixels. Sources dropped by trim() or
+        unload() stay with 0 bytes, their load time was still spent.
+        """
+        size = {path: surface_bytes(surf) for path, surf in self._surfaces.items()}
+        counted = {id(surf) for surf in self._surfaces.values()}
+        for (path, _, _), surf in list(self._variants.items()):
+            if id(surf) not in counted:
+                counted.add(id(surf))
+                size[path] = size.get(path, 0) + surface_bytes(surf)
+        for path in self.load_ms:
+            size.setdefault(path, 0)
+        rows = [(path, n, self.load_ms.get(path, 0.0), sorted(map(str, self._owners.get(path, ()))))
+                for path, n in size.items()]
+        return sorted(rows, key=lambda row: (-row[1], -row[2]))
+
+    def ready(self, paths):
+        sources = [self._source(p) for p in paths]
+        return all(p in self._surfaces or (p in self._pending and self._pending[p].done())
+                   for p in sources)
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+class TextCache:
+    """
+    LRU cache for rendered text.
+    Key: (font, text, color, antialias)
+    prepare(surface) finishes every new entry, e.g. render.normalize.
+    """
+    def __init__(self, max_entries=128, prepare=None):
+        self.max_entries = max_entries
+        self.prepare = prepare
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def render(self, font, text, color, antialias=True):
+        key = (font, text, tuple(color), antialias)
+        surf = self._entries.get(key)
+        if surf is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return surf
+
+        self.misses += 1
+        surf = font.render(text, antialias, color)
+        if self.prepare:
+            surf = self.prepare(surf)
+        self._entries[key] = surf
+        if len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return surf
+
+    def resident_bytes(self):
+        """Pixel memory of the cached text surfaces."""
+        return sum(surface_bytes(surf) for surf in self._entries.values())
+
+    def clear(self):
+        self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,153 @@
+"""
+Texture atlases.
+
+    python atlas.py                  # pack every sprite the game loads
+    python atlas.py a.png b.png      # pack only these
+    python atlas.py --max-side 1024  # keep more detail
+
+Packs sprites into a few sheets under sprites/atlas/ plus a manifest,
+atlas.json:
+
+    {
+      "sheets": ["sprites/atlas/atlas0.png", ...],
+      "sprites": {path: [sheet, x, y, w, h, source mtime_ns, source size], ...}
+    }
+
+The game's sprites are packed in groups, the shared ones and then each
+level's, every group into sheets of its own, so a level's sheets can be
+unloaded with it (AssetManager.release()). Sprites larger than --max-side
+are scaled down first, the game scales
+every sprite to its on-screen size anyway. AssetManager.load_atlas() reads
+the manifest: each sheet is decoded once and sprites are handed out as
+subsurface views of it. Sprites whose source file changed since the
+build are loaded from the file again, rerun this after editing sprites.
+"""
+import argparse
+import json
+import os
+import sys
+
+import pygame
+
+MANIFEST = "sprites/atlas/atlas.json"
+SHEET_SIZE = 2048
+MAX_SIDE = 512
+PADDING = 1
+
+
+def read_manifest(path=MANIFEST):
+    """{path: (sheet path, rect)} for sprites whose source is unchanged, {} without a manifest."""
+    try:
+        with open(path, encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    sheets = manifest["sheets"]
+    entries = {}
+    for name, (sheet, x, y, w, h, mtime_ns, size) in manifest["sprites"].items():
+        try:
+            st = os.stat(name)
+            if (st.st_mtime_ns, st.st_size) != (mtime_ns, size):
+                continue
+        except OSError:
+            pass  # source not shipped, the atlas copy is all there is
+        entries[name] = (sheets[sheet], pygame.Rect(x, y, w, h))
+    return entries
+
+
+def _load(path, max_side):
+    img = pygame.image.load(path)
+    # 32-bit with alpha, so smoothscale works without a display
+    surf = pygame.Surface(img.get_size(), pygame.SRCALPHA, 32)
+    surf.blit(img, (0, 0))
+    w, h = surf.get_size()
+    if max(w, h) > max_side:
+        scale = max_side / max(w, h)
+        surf = pygame.transform.smoothscale(surf, (max(1, round(w * scale)), max(1, round(h * scale))))
+    return surf
+
+
+def pack(sizes, sheet_size=SHEET_SIZE, padding=PADDING):
+    """
+    Shelf packing, tallest first. sizes: {name: (w, h)}.
+    Returns {name: (sheet, x, y)} and the used (w, h) of each sheet.
+    """
+    placed = {}
+    sheets = []
+    x = y = shelf = 0
+    for name, (w, h) in sorted(sizes.items(), key=lambda item: (-item[1][1], item[0])):
+        if sheets and x + w > sheet_size:
+            x, y, shelf = 0, y + shelf, 0
+        if not sheets or y + h > sheet_size:
+            sheets.append([0, 0])
+            x = y = shelf = 0
+        placed[name] = (len(sheets) - 1, x, y)
+        used = sheets[-1]
+        used[0] = max(used[0], x + w)
+        used[1] = max(used[1], y + h)
+        x += w + padding
+        shelf = max(shelf, h + padding)
+    return placed, [tuple(s) for s in sheets]
+
+
+def build(groups, manifest=MANIFEST, sheet_size=SHEET_SIZE, max_side=MAX_SIDE):
+    """
+    Pack groups (lists of paths) into sheets next to manifest, each group
+    on sheets of its own. A path in several groups goes with the first.
+    Returns the number of sheets.
+    """
+    folder = os.path.dirname(manifest)
+    os.makedirs(folder, exist_ok=True)
+    seen = set()
+    sheets = []
+    sprites = {}
+    for paths in groups:
+        images = {}
+        for path in paths:
+            name = os.path.normpath(path)
+            if name in seen or not os.path.exists(name):
+                continue
+            seen.add(name)
+            images[name] = _load(name, min(max_side, sheet_size))
+
+        placed, used = pack({name: img.get_size() for name, img in images.items()}, sheet_size)
+        first = len(sheets)
+        sheets += [pygame.Surface(size, pygame.SRCALPHA, 32) for size in used]
+        for name, (sheet, x, y) in placed.items():
+            img = images[name]
+            sheets[first + sheet].blit(img, (x, y))
+            st = os.stat(name)
+            sprites[name] = [first + sheet, x, y, *img.get_size(), st.st_mtime_ns, st.st_size]
+
+    sheet_paths = []
+    for i, surf in enumerate(sheets):
+        sheet_path = os.path.join(folder, f"atlas{i}.png")
+        pygame.image.save(surf, sheet_path)
+        sheet_paths.append(sheet_path)
+    with open(manifest, "w", encoding="utf-8") as f:
+        json.dump({"sheets": sheet_paths, "sprites": sprites}, f, indent=1, ensure_ascii=False)
+    return len(sheets)
+
+
+def game_groups():
+    """Every sprite the game loads: the shared sprites, then each level's assets."""
+    import main as game
+    return [list(game.STARTUP_ASSETS)] + [level.asset_paths for level in game.load_levels()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("paths", nargs="*", help="sprites to pack (default: everything the game loads)")
+    parser.add_argument("--manifest", default=MANIFEST)
+    parser.add_argument("--sheet-size", type=int, default=SHEET_SIZE)
+    parser.add_argument("--max-side", type=int, default=MAX_SIDE, help="scale larger sprites down to this")
+    args = parser.parse_args()
+
+    groups = [args.paths] if args.paths else game_groups()
+    n = build(groups, args.manifest, args.sheet_size, args.max_side)
+    print(f"{len(read_manifest(args.manifest))} sprites in {n} sheet(s), manifest {args.manifest}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
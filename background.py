@@ -0,0 +1,60 @@
+import pygame
+
+from assets import surface_bytes
+from render import normalize
+
+
+class Layer:
+    """
+    One parallax depth of a level background, painted once into an
+    off-screen surface and then drawn with a single area-blit.
+    paint(surface) draws the content, x is the screen position of the
+    surface's left edge while camera and offset are 0.
+    scroll: px moved per px of camera movement (0 = fixed to the screen)
+    shift:  px moved per px of the level's parallax offset
+    """
+    def __init__(self, paint, size, x=0, opaque=False, scroll=0.0, shift=0.0):
+        self.paint = paint
+        self.size = tuple(size)
+        self.x = x
+        self.opaque = opaque
+        self.scroll = scroll
+        self.shift = shift
+        self.surface = None
+
+    def bake(self):
+        if self.opaque:
+            surf = pygame.Surface(self.size).convert()
+        else:
+            surf = pygame.Surface(self.size, pygame.SRCALPHA).convert_alpha()
+        self.paint(surf)
+        # A layer painted full (e.g. an opaque image) blits without blending
+        self.surface = surf if self.opaque else normalize(surf)
+
+    def draw(self, screen, cam_x, offset=0):
+        if self.surface is None:
+            self.bake()
+        sx = self.x - int(cam_x * self.scroll) + int(offset * self.shift)
+        left = max(0, -sx)
+        width = min(self.size[0] - left, screen.get_width() - max(sx, 0))
+        if width > 0:
+            screen.blit(self.surface, (max(sx, 0), 0), (left, 0, width, self.size[1]))
+
+
+class Background:
+    """A level's static background: layers drawn back to front."""
+    def __init__(self, *layers):
+        self.layers = layers
+
+    def draw(self, screen, cam_x, offset=0):
+        for layer in self.layers:
+            layer.draw(screen, cam_x, offset)
+
+    def invalidate(self):
+        """Repaint on next draw, e.g. after the display mode changed."""
+        for layer in self.layers:
+            layer.surface = None
+
+    def resident_bytes(self):
+        """Pixel memory of the baked layers, 0 until drawn or after invalidate()."""
+        return sum(surface_bytes(layer.surface) for layer in self.layers)
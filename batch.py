@@ -0,0 +1,235 @@
+"""
+Brute-force level validation.
+
+    python batch.py levels/*.json                           # every policy on every level
+    python batch.py --generate 500 --screens 10 --policies react:80,hurdles
+    python batch.py levels/level1.json --policies hop:30,random:0.05 --json report.json
+
+Runs player physics (physics.step, no display) for every (level, input
+policy) pair on a process pool and reports which levels can be
+completed, how fast, and where players die or get stuck. Fights are
+counted as won after FightScene.DURATION.
+
+Policies, all holding right:
+    run          never jump
+    hop:N        jump every N steps
+    react:D      jump when an obstacle starts within D px ahead
+    random:P     jump with probability P per step
+    hurdles      jump at levelgen.takeoffs() (generated levels only)
+"""
+import argparse
+import json
+import os
+import random
+import sys
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import main as game
+import levelfile
+import levelgen
+import physics
+from spatial import SpatialGrid
+
+POLICIES = "run,hop:40,react:80,random:0.05,hurdles"
+STUCK_STEPS = 600       # no new furthest x for this long = stuck
+MAX_SCREEN_STEPS = 2000  # step budget per screen of level
+HOTSPOT_PX = 100         # death positions are bucketed this wide
+
+
+# --- Policies: policy(body, t, course) -> jump now ---
+def run_policy():
+    return lambda body, t, course: False
+
+def hop_policy(every):
+    every = int(every)
+    return lambda body, t, course: t % every == 0
+
+def react_policy(distance):
+    distance = int(distance)
+
+    def policy(body, t, course):
+        front = body.player.right
+        obs = course.obstacles
+        return any(obs.x[i] >= front for i in course.grid.query_range(front, front + distance))
+    return policy
+
+def random_policy(p, seed=0):
+    rng = random.Random(seed)
+    p = float(p)
+    return lambda body, t, course: rng.random() < p
+
+def hurdles_policy(course):
+    jumps = levelgen.takeoffs(course.meta) if "hurdles" in course.meta else []
+    state = {"next": 0}
+
+    def policy(body, t, course):
+        i = state["next"]
+        if i < len(jumps) and body.player.x >= jumps[i]:
+            state["next"] = i + 1
+            return True
+        return False
+    return policy
+
+
+def make_policy(spec, course, seed):
+    name, _, arg = spec.partition(":")
+    if name == "run":
+        return run_policy()
+    if name == "hop":
+        return hop_policy(arg or 40)
+    if name == "react":
+        return react_policy(arg or 80)
+    if name == "random":
+        return random_policy(arg or 0.05, seed)
+    if name == "hurdles":
+        return hurdles_policy(course)
+    raise ValueError(f"unknown policy {spec!r}")
+
+
+# --- Levels ---
+class Course:
+    """What physics needs of a level: obstacles, their grid and the entities. No sprites."""
+    def __init__(self, data):
+        self.meta = data.meta
+        self.width = game.WIDTH * data.screens
+        self.obstacles = game.new_obstacles()
+        for typ, x, dy, w, h in data.obstacles():
+            self.obstacles.add(typ, x, game.GROUND_Y + dy, w, h)
+        self.grid = SpatialGrid(self.obstacles, game.GRID_CELL_SIZE)
+        self.entities = game.level_from_data(data).entity_factory()
+
+
+def load_level(spec):
+    """LevelData for a path or ("generated", seed, screens)."""
+    if isinstance(spec, str):
+        return levelfile.load(spec)
+    _, seed, screens = spec
+    return levelfile.from_dict(levelgen.generate(seed=seed, screens=screens))
+
+
+def level_name(spec):
+    return spec if isinstance(spec, str) else f"generated:{spec[1]}:{spec[2]}"
+
+
+# --- Simulation ---
+def simulate(job):
+    """Play one (level, policy, seed) job, returns its result dict."""
+    spec, policy_spec, seed = job
+    course = Course(load_level(spec))
+    policy = make_policy(policy_spec, course, seed)
+    body = physics.Body(game.GROUND_Y)
+    player, ents = body.player, course.entities
+    max_steps = MAX_SCREEN_STEPS * course.width // game.WIDTH
+    deaths = []
+    fights = 0
+    furthest, progress_t = player.x, 0
+    result = {"level": level_name(spec), "policy": policy_spec, "completed": False}
+
+    for t in range(max_steps):
+        if policy(body, t, course):
+            physics.jump(body)
+        before = player.x
+        opponent = physics.step(body, False, True, course.obstacles, course.grid, ents)
+        if opponent is not None:
+            ents.kill(opponent)  # [F]
+            fights += 1
+        if player.x == -physics.PLAYER_WIDTH and before > player.x + physics.PLAYER_SPEED:
+            deaths.append(before)
+        if player.x > furthest:
+            furthest, progress_t = player.x, t
+        elif t - progress_t >= STUCK_STEPS:
+            result["stuck_at"] = furthest
+            break
+        if player.x >= course.width and not ents.remaining(ents.battle):
+            result["completed"] = True
+            break
+
+    result.update(
+        steps=t + 1,
+        seconds=round((t + 1) * game.STEP_MS / 1000 + fights * game.FightScene.DURATION / 1000, 2),
+        fights=fights,
+        deaths=deaths,
+        furthest=furthest,
+    )
+    return result
+
+
+def run_batch(levels, policies, workers=None, seed=0):
+    jobs = [(spec, policy, seed + i) for i, spec in enumerate(levels) for policy in policies]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(simulate, jobs, chunksize=max(1, len(jobs) // (4 * (workers or os.cpu_count() or 1)))))
+
+
+def summarize(results):
+    """Per level: completing policies, best time and death hotspots. Per policy: completion rate."""
+    levels = defaultdict(list)
+    for r in results:
+        levels[r["level"]].append(r)
+
+    report = {"levels": {}, "policies": {}}
+    for name, rs in levels.items():
+        done = [r for r in rs if r["completed"]]
+        hotspots = Counter(int(x) // HOTSPOT_PX * HOTSPOT_PX for r in rs for x in r["deaths"])
+        report["levels"][name] = {
+            "completable": bool(done),
+            "completed_by": [r["policy"] for r in done],
+            "best_seconds": min((r["seconds"] for r in done), default=None),
+            "furthest": max(r["furthest"] for r in rs),
+            "stuck_at": sorted({r["stuck_at"] for r in rs if "stuck_at" in r}),
+            "death_hotspots": hotspots.most_common(5),
+        }
+    by_policy = defaultdict(list)
+    for r in results:
+        by_policy[r["policy"]].append(r)
+    for policy, rs in by_policy.items():
+        done = [r["seconds"] for r in rs if r["completed"]]
+        report["policies"][policy] = {
+            "completed": len(done),
+            "jobs": len(rs),
+            "mean_seconds": round(sum(done) / len(done), 2) if done else None,
+        }
+    return report
+
+
+def print_report(report):
+    print(f"{'policy':<14}{'completed':>12}{'mean s':>10}")
+    for policy, p in report["policies"].items():
+        mean = f"{p['mean_seconds']:.2f}" if p["mean_seconds"] is not None else "-"
+        print(f"{policy:<14}{p['completed']:>6}/{p['jobs']:<5}{mean:>10}")
+    stuck = [name for name, lv in report["levels"].items() if not lv["completable"]]
+    print(f"\n{len(report['levels']) - len(stuck)}/{len(report['levels'])} levels completable")
+    for name in stuck[:20]:
+        lv = report["levels"][name]
+        print(f"  FAIL {name}: furthest x {lv['furthest']}, stuck at {lv['stuck_at']}, "
+              f"deaths near {[x for x, _ in lv['death_hotspots']]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("levels", nargs="*", help="level files (default: the game's levels)")
+    parser.add_argument("--generate", type=int, default=0, help="also test this many generated levels")
+    parser.add_argument("--screens", type=int, default=game.SCREENS_PER_LEVEL, help="screens per generated level")
+    parser.add_argument("--policies", default=POLICIES)
+    parser.add_argument("--workers", type=int, help="processes (default: all cores)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="write results and summary to this file")
+    args = parser.parse_args()
+
+    levels = list(args.levels or ([] if args.generate else game.LEVEL_FILES))
+    levels += [("generated", args.seed + i, args.screens) for i in range(args.generate)]
+    policies = [p for p in args.policies.split(",") if p]
+    results = run_batch(levels, policies, args.workers, args.seed)
+    report = summarize(results)
+    print_report(report)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"summary": report, "results": results}, f, indent=1)
+    return 0 if all(lv["completable"] for lv in report["levels"].values()) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,208 @@
+"""
+Headless frame-time benchmark.
+
+    python bench.py                       # playthrough, stress, generated, streamed and endless levels
+    python bench.py --json out.json       # also write the percentiles
+    python bench.py --baseline out.json   # exit 1 if frame p90 regressed
+    python bench.py --renderers surface,sdl2 --scales "" --generated "" --streamed "" --endless 0
+                                          # playthrough per render backend
+"""
+import argparse
+import json
+import random
+import sys
+
+import pygame
+
+import main as game
+import physics
+import levelgen
+import levelfile
+from inputs import ScriptedInput
+from profiler import Profiler
+
+SECTIONS = ["events", "stream", "physics", "collision", "background", "obstacles", "player", "ui", "flip", "frame"]
+PERCENTILES = (50, 90, 99)
+
+
+def taps(key, frames):
+    """Press key on each frame and release it on the next."""
+    script = []
+    for f in frames:
+        script += [(f, key, True), (f + 1, key, False)]
+    return script
+
+
+# Space starts the game, right is held throughout, the jumps clear every
+# obstacle and F wins each battle. Ends with the last level completed.
+PLAYTHROUGH = ([(0, pygame.K_SPACE, True), (1, pygame.K_SPACE, False), (1, pygame.K_RIGHT, True)]
+               + taps(pygame.K_SPACE, [30, 72, 92, 112, 204, 286,
+                                       765, 864,
+                                       1506, 1526, 1607, 1627])
+               + taps(pygame.K_f, [403, 1146, 1873]))
+
+
+def stress_level(factor, seed=0):
+    """
+    Level 1 with every obstacle copied factor times to random x positions,
+    plus factor patrolling enemies and moving obstacles.
+    """
+    base = game.levels[0]
+    rng = random.Random(seed)
+
+    def factory():
+        src, obs = base.obstacle_factory(), game.new_obstacles()
+        for i in range(len(src)):
+            name, _, y, w, h, surf = src.entry(i)
+            for _ in range(factor):
+                obs.add(name, rng.randrange(0, base.width - w), y, w, h, surf)
+        return obs
+
+    def entity_factory():
+        ents = base.entity_factory()
+        for i in range(factor):
+            name = ("patrol", "rotating")[i % 2]
+            x = rng.randrange(0, base.width - 200)
+            ents.add(name, x, game.GROUND_Y - ents.sizes[ents.code(name)][1], rng.randrange(50, 200))
+        return ents
+
+    return game.Level(
+        background=base.background,
+        obstacle_factory=factory,
+        entity_factory=entity_factory,
+        clouds=game.levels[1].clouds,
+        asset_paths=base.asset_paths,
+        screens=base.screens
+    )
+
+
+def bench_playthrough():
+    prof = Profiler()
+    last = game.run(inputs=ScriptedInput(PLAYTHROUGH), prof=prof)
+    world = getattr(last, "world", None)
+    if world is None or world.level_idx != game.NUM_LEVELS - 1 or not world.level_clear:
+        raise RuntimeError("playthrough script did not finish the game")
+    return prof
+
+
+def bench_level(level, takeoffs, frames, sprites):
+    """Cross a level by holding right and jumping at every takeoff, returns the profiler and the World."""
+    world = game.World(0, sprites, level=level)
+    # Holding right from frame 0, the player is at -PLAYER_WIDTH + f * PLAYER_SPEED on frame f
+    jumps = [-(-(t + physics.PLAYER_WIDTH) // physics.PLAYER_SPEED) for t in takeoffs]
+    script = [(0, pygame.K_RIGHT, True)] + taps(pygame.K_SPACE, [f for f in jumps if f < frames])
+    prof = Profiler()
+    game.run(game.PlayingScene(world), ScriptedInput(script), max_frames=frames, prof=prof)
+    return prof, world
+
+
+def bench_generated(screens, frames, sprites, seed=0, stream=False):
+    """A generated level, loaded whole or streamed a screen at a time."""
+    level = levelgen.generate(seed=seed, screens=screens)
+    level["stream"] = stream
+    data = levelfile.from_dict(level)
+    return bench_level(game.level_from_data(data), levelgen.takeoffs(level), frames, sprites)
+
+
+def bench_endless(frames, sprites, seed=0):
+    screens = frames * physics.PLAYER_SPEED // game.WIDTH + 1
+    takeoffs = levelgen.endless_takeoffs(seed, screens)
+    return bench_level(levelgen.endless_level(seed), takeoffs, frames, sprites)
+
+
+def stream_report(name, world, frames):
+    """Streamed levels: check the player got through, show how much was resident."""
+    stream = world.stream
+    print(f"{name}: screen {world.cam_x // game.WIDTH + 1}, {stream.loads} segments loaded, "
+          f"at most {stream.peak} obstacles resident")
+    # Holding right without dying, the player ends up frames * PLAYER_SPEED along
+    expected = -physics.PLAYER_WIDTH + frames * physics.PLAYER_SPEED
+    if world.level.width is not None:
+        expected = min(expected, world.level.width)
+    if world.player.x < expected:
+        raise RuntimeError(f"{name}: player stopped at x {world.player.x}, expected {expected}")
+
+
+def bench_stress(factor, frames, sprites):
+    world = game.World(0, sprites, level=stress_level(factor))
+    script = [(0, pygame.K_RIGHT, True)] + taps(pygame.K_SPACE, range(0, frames, 45))
+    prof = Profiler()
+    game.run(game.PlayingScene(world), ScriptedInput(script), max_frames=frames, prof=prof)
+    return prof
+
+
+def print_report(name, report):
+    print(f"\n{name} (ms)")
+    print(f"  {'section':<12}" + "".join(f"{'p%d' % p:>10}" for p in PERCENTILES))
+    for section in SECTIONS:
+        if section in report:
+            print(f"  {section:<12}" + "".join(f"{report[section][p]:>10.3f}" for p in PERCENTILES))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--frames", type=int, default=600, help="frames per stress level")
+    parser.add_argument("--scales", default="10,100,1000", help="obstacle multipliers for stress levels")
+    parser.add_argument("--generated", default="100,1000", help="screens of generated levels")
+    parser.add_argument("--streamed", default="1000", help="screens of generated levels streamed by screen")
+    parser.add_argument("--endless", type=int, default=6000, help="frames of an endless level, 0 = skip")
+    parser.add_argument("--renderers", default=game.RENDERER,
+                        help="render backends, everything runs on the first, the playthrough on the rest")
+    parser.add_argument("--json", help="write percentiles (ms) to this file")
+    parser.add_argument("--baseline", help="compare frame p90 against this JSON report")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed p90 slowdown vs baseline")
+    args = parser.parse_args()
+
+    renderers = args.renderers.split(",")
+    game.init(headless_mode=True, renderer=renderers[0])
+    sprites = game.Sprites()
+
+    results = {"playthrough": bench_playthrough().percentiles(PERCENTILES)}
+    rows = game.assets.report()
+    baked = sum(n for _, n in game.baked_bytes())
+    print(f"assets after the playthrough: {sum(1 for _, n, _, _ in rows if n)} resident, "
+          f"{(sum(n for _, n, _, _ in rows) + baked) / 2**20:.1f} MiB ({baked / 2**20:.1f} MiB baked backgrounds "
+          f"and text), {sum(ms for _, _, ms, _ in rows):.0f} ms to load")
+    for factor in (int(s) for s in args.scales.split(",") if s):
+        results[f"stress-{factor}x"] = bench_stress(factor, args.frames, sprites).percentiles(PERCENTILES)
+    for screens in (int(s) for s in args.generated.split(",") if s):
+        prof, _ = bench_generated(screens, args.frames, sprites)
+        results[f"generated-{screens}"] = prof.percentiles(PERCENTILES)
+    for screens in (int(s) for s in args.streamed.split(",") if s):
+        prof, world = bench_generated(screens, args.frames, sprites, stream=True)
+        stream_report(f"streamed-{screens}", world, args.frames)
+        results[f"streamed-{screens}"] = prof.percentiles(PERCENTILES)
+    if args.endless:
+        prof, world = bench_endless(args.endless, sprites)
+        stream_report("endless", world, args.endless)
+        results["endless"] = prof.percentiles(PERCENTILES)
+    for renderer in renderers[1:]:
+        game.init(headless_mode=True, renderer=renderer)
+        results[f"playthrough-{renderer}"] = bench_playthrough().percentiles(PERCENTILES)
+    for name, report in results.items():
+        print_report(name, report)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+    failed = False
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        for name, report in results.items():
+            before = baseline.get(name, {}).get("frame", {}).get("90")
+            if before is None:
+                continue
+            after = report["frame"][90]
+            if after > before * (1 + args.tolerance):
+                print(f"REGRESSION {name}: frame p90 {before:.3f}ms -> {after:.3f}ms")
+                failed = True
+
+    game.assets.shutdown()
+    pygame.quit()
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,122 @@
+from array import array
+
+DEFAULT_COLOR = (200, 60, 60)
+
+
+class Entities:
+    """
+    Level entities (bosses, enemies, moving obstacles) as parallel arrays,
+    one slot per entity: x, y, w, h, vx (px per step), patrol bounds
+    x_min/x_max, prev_x (x at the start of the step, for interpolation),
+    kind (type code), alive and frame (animation frame).
+    Per-type tables indexed by the type code are built from the entity
+    type registry: names, sizes, colors, battle/deadly flags, effects and
+    frame timing. The systems, move(), animate() and touching(), each run
+    over every entity in one pass.
+    """
+    def __init__(self, registry, effects):
+        self.registry = registry
+        self.effects_by_name = effects
+        self.names = []
+        self.sizes = []
+        self.colors = []
+        self.speeds = []
+        self.battle = []
+        self.deadly = []
+        self.effects = []
+        self.frame_counts = []
+        self.frame_ms = []
+        self._codes = {}
+        for name in registry:
+            self.code(name)
+
+        self.x = array("i")
+        self.y = array("i")
+        self.w = array("i")
+        self.h = array("i")
+        self.vx = array("i")
+        self.x_min = array("i")
+        self.x_max = array("i")
+        self.prev_x = array("i")
+        self.kind = array("B")
+        self.alive = array("B")
+        self.frame = array("B")
+        self.moving = []  # indices with a patrol range
+
+    def code(self, name):
+        code = self._codes.get(name)
+        if code is None:
+            entry = self.registry.get(name, {})
+            code = self._codes[name] = len(self.names)
+            self.names.append(name)
+            self.sizes.append(tuple(entry.get("size", (40, 40))))
+            self.colors.append(entry.get("color", DEFAULT_COLOR))
+            self.speeds.append(entry.get("speed", 0))
+            self.battle.append(entry.get("battle", False))
+            self.deadly.append(entry.get("deadly", False))
+            self.effects.append(self.effects_by_name.get(entry.get("effect")))
+            self.frame_counts.append(max(1, len(entry.get("frames", ()))))
+            self.frame_ms.append(entry.get("frame_ms", 150))
+        return code
+
+    def add(self, name, x, y, patrol=0, size=None):
+        """Spawn at x, y (top left). patrol: px to walk right of x and back, 0 = stand still."""
+        k = self.code(name)
+        w, h = size or self.sizes[k]
+        i = len(self.kind)
+        self.x.append(x)
+        self.y.append(y)
+        self.w.append(w)
+        self.h.append(h)
+        self.vx.append(self.speeds[k] if patrol else 0)
+        self.x_min.append(x)
+        self.x_max.append(x + patrol)
+        self.prev_x.append(x)
+        self.kind.append(k)
+        self.alive.append(1)
+        self.frame.append(0)
+        if patrol and self.speeds[k]:
+            self.moving.append(i)
+        return i
+
+    def kill(self, i):
+        self.alive[i] = 0
+
+    def remaining(self, flags):
+        """Whether any living entity's type has flags[type] set, e.g. remaining(self.battle)."""
+        kind, alive = self.kind, self.alive
+        return any(alive[i] and flags[kind[i]] for i in range(len(kind)))
+
+    def settle(self):
+        self.prev_x[:] = self.x
+
+    # --- Systems ---
+    def move(self):
+        """Walk every patrolling entity one step, turning at the ends of its range."""
+        xs, vx, lo, hi, alive = self.x, self.vx, self.x_min, self.x_max, self.alive
+        for i in self.moving:
+            if alive[i]:
+                x = xs[i] + vx[i]
+                if x <= lo[i]:
+                    x, vx[i] = lo[i], abs(vx[i])
+                elif x >= hi[i]:
+                    x, vx[i] = hi[i], -abs(vx[i])
+                xs[i] = x
+
+    def animate(self, now):
+        """Frame of every entity at time now (ms), staggered so neighbours don't step in sync."""
+        frame, kind, counts, frame_ms = self.frame, self.kind, self.frame_counts, self.frame_ms
+        for i in range(len(kind)):
+            k = kind[i]
+            if counts[k] > 1:
+                frame[i] = (int(now // frame_ms[k]) + i) % counts[k]
+
+    def touching(self, rect):
+        """Indices of living entities overlapping rect, in spawn order."""
+        rx, ry, rw, rh = rect
+        xs, ys, ws, hs, alive = self.x, self.y, self.w, self.h, self.alive
+        return [i for i in range(len(xs))
+                if alive[i] and xs[i] < rx + rw and rx < xs[i] + ws[i] and ys[i] < ry + rh and ry < ys[i] + hs[i]]
+
+    def __len__(self):
+        return len(self.kind)
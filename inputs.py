@@ -0,0 +1,179 @@
+import struct
+import zlib
+from array import array
+
+import pygame
+
+
+class KeyState:
+    """Stand-in for pygame.key.get_pressed(): keys[pygame.K_x] -> bool."""
+    def __init__(self, held=()):
+        self.held = frozenset(held)
+
+    def __getitem__(self, key):
+        return key in self.held
+
+
+class LiveInput:
+    """Keyboard and window events from pygame."""
+    sync_loading = False
+
+    def poll(self):
+        return pygame.event.get()
+
+    def keys(self):
+        return pygame.key.get_pressed()
+
+    def elapsed(self, ms):
+        """Time the frame advances the simulation by, given the measured ms."""
+        return ms
+
+
+class ScriptedInput:
+    """
+    Replays a script of (frame, key, pressed) entries.
+    A press emits a KEYDOWN event and holds the key until its release.
+    """
+    sync_loading = False
+
+    def __init__(self, script):
+        self.script = sorted(script, key=lambda entry: entry[0])
+        self.frame = 0
+        self._pos = 0
+        self._held = set()
+        self._keys = KeyState()
+
+    def poll(self):
+        # Only window close gets through from the real event queue
+        events = [e for e in pygame.event.get() if e.type == pygame.QUIT]
+        changed = False
+        while self._pos < len(self.script) and self.script[self._pos][0] <= self.frame:
+            _, key, pressed = self.script[self._pos]
+            self._pos += 1
+            changed = True
+            if pressed:
+                self._held.add(key)
+                events.append(pygame.event.Event(pygame.KEYDOWN, key=key))
+            else:
+                self._held.discard(key)
+                events.append(pygame.event.Event(pygame.KEYUP, key=key))
+        if changed:
+            self._keys = KeyState(self._held)
+        self.frame += 1
+        return events
+
+    def keys(self):
+        return self._keys
+
+    def elapsed(self, ms):
+        return ms
+
+
+# --- Recordings ---
+# Header: magic, version, frame count, number of keys, event count,
+# outcome (level, player x, player y), then the key codes (int32 each).
+# Body (zlib): per frame elapsed ms (float64), held-key bitmask (uint16)
+# and event count (uint8), then the events as uint8: key index, bit 7 set
+# for a press.
+MAGIC = b"RPLY"
+VERSION = 1
+_HEADER = struct.Struct("<4sHIBIiii")
+_PRESS = 0x80
+
+
+class Recorder:
+    """
+    Passes another input source through and records, per frame, the
+    elapsed time, which of keys are held and their presses/releases.
+    Everything the simulation sees, so Replay reproduces the run exactly.
+    Asset loading is synchronous while recording, so scene changes don't
+    depend on the loader threads.
+    """
+    sync_loading = True
+
+    def __init__(self, source, keys):
+        self.source = source
+        self.key_codes = tuple(keys)
+        self._index = {k: i for i, k in enumerate(self.key_codes)}
+        self.elapsed_ms = array("d")
+        self.held = array("H")
+        self.counts = array("B")
+        self.events = array("B")
+
+    def poll(self):
+        events = self.source.poll()
+        count = 0
+        for e in events:
+            if e.type in (pygame.KEYDOWN, pygame.KEYUP) and e.key in self._index:
+                self.events.append(self._index[e.key] | (_PRESS if e.type == pygame.KEYDOWN else 0))
+                count += 1
+        self.counts.append(min(count, 255))
+        return events
+
+    def keys(self):
+        keys = self.source.keys()
+        self.held.append(sum(1 << i for i, k in enumerate(self.key_codes) if keys[k]))
+        return keys
+
+    def elapsed(self, ms):
+        ms = self.source.elapsed(ms)
+        self.elapsed_ms.append(ms)
+        return ms
+
+    def save(self, path, outcome):
+        """Write the recording. outcome: (level index, player x, player y) to verify against."""
+        n = len(self.held)  # a frame that ended by quitting has no keys
+        events = self.events[:sum(self.counts[:n])]
+        body = (self.elapsed_ms[:n].tobytes() + self.held[:n].tobytes()
+                + self.counts[:n].tobytes() + events.tobytes())
+        header = _HEADER.pack(MAGIC, VERSION, n, len(self.key_codes), len(events), *outcome)
+        keys = array("i", self.key_codes).tobytes()
+        with open(path, "wb") as f:
+            f.write(header + keys + zlib.compress(body, 9))
+
+
+class Replay:
+    """Plays a Recorder file back frame by frame, plus real window close events."""
+    sync_loading = True
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            blob = f.read()
+        magic, version, n, n_keys, n_events, *outcome = _HEADER.unpack_from(blob)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path}: not a version {VERSION} recording")
+        pos = _HEADER.size
+        self.key_codes = array("i", blob[pos:pos + 4*n_keys])
+        body = zlib.decompress(blob[pos + 4*n_keys:])
+        self.elapsed_ms = array("d", body[:8*n])
+        self.held = array("H", body[8*n:10*n])
+        self.counts = array("B", body[10*n:11*n])
+        self.events = array("B", body[11*n:11*n + n_events])
+        self.outcome = tuple(outcome)
+        self.frames = n
+        self.frame = 0
+        self._event_pos = 0
+        self._states = {}  # bitmask -> KeyState
+
+    def __len__(self):
+        return self.frames
+
+    def poll(self):
+        events = [e for e in pygame.event.get() if e.type == pygame.QUIT]
+        count = self.counts[self.frame]
+        for code in self.events[self._event_pos:self._event_pos + count]:
+            key = self.key_codes[code & ~_PRESS]
+            events.append(pygame.event.Event(pygame.KEYDOWN if code & _PRESS else pygame.KEYUP, key=key))
+        self._event_pos += count
+        return events
+
+    def keys(self):
+        mask = self.held[self.frame]
+        self.frame += 1  # the loop asks for elapsed(), poll(), keys() in that order
+        state = self._states.get(mask)
+        if state is None:
+            state = self._states[mask] = KeyState(k for i, k in enumerate(self.key_codes) if mask >> i & 1)
+        return state
+
+    def elapsed(self, ms):
+        return self.elapsed_ms[self.frame]
@@ -0,0 +1,208 @@
+"""
+Level files.
+
+A level is a JSON file:
+
+    {
+      "screens": 3,                       level width in screens, null: endless
+      "stream": true,                     optional, load obstacles a screen at a time (see stream.py)
+      "boss": "enemy",                    boss name, see main.BOSSES
+      "obstacle_sprites": "sprites/...",  optional, one image folder per obstacle type
+      "background": [layer, ...],         back to front
+      "clouds": {"big": [[x, y], ...], "small": [[x, y], ...]} or null,
+      "obstacles": [[type, x, dy, w, h], ...]    dy: top edge relative to the ground
+      "entities": [[type, x, dy, patrol], ...]   optional, see main.ENTITY_TYPES,
+                                                 patrol: px walked right of x and back
+    }
+
+Background layers take the optional keys x, width, scroll and shift (see
+background.Layer), fill [r, g, b], image (scaled to the layer), shapes
+[["rect" | "ellipse", color, rect], ...] and placements [[path, x, y, w, h], ...],
+all in screen coordinates.
+
+load() compiles a level once into __cache__/<name>.bin next to the file:
+obstacles as packed int32 rects and uint8 type ids, everything else as
+JSON. The cache is used while the source's mtime and size match, or its
+sha1 if they don't; otherwise the level is compiled again.
+
+Streamed levels are compiled with their obstacles sorted by x, so a
+segment is one run of the cache. When loaded from a cache they keep no
+obstacles in memory: segment() reads each segment's run from the file,
+only the offset of every segment is kept. They also drop levelgen's
+"hurdles", which the game doesn't use.
+"""
+import hashlib
+import json
+import os
+import struct
+import sys
+from array import array
+
+MAGIC = b"LVLC"
+VERSION = 2
+# magic, version, source mtime_ns, source size, source sha1, meta bytes, obstacle count
+_HEADER = struct.Struct("<4sHqq20sII")
+
+
+class LevelData:
+    """
+    A compiled level. Obstacles are kept packed, see obstacles(). With a
+    source of (cache path, offset of the rects, obstacle count) instead
+    of rects and type_ids they are read from the cache when needed.
+    """
+    def __init__(self, meta, rects, type_ids, source=None):
+        self.meta = meta
+        self.screens = meta.get("screens", 3)
+        self.boss = meta.get("boss")
+        self.obstacle_sprites = meta.get("obstacle_sprites")
+        self.background = meta.get("background", [])
+        self.clouds = meta.get("clouds")
+        self.entities = meta.get("entities", [])
+        self.stream = meta.get("stream", False)
+        self.types = meta["types"]  # type id -> type name
+        self.rects = rects          # array('i'), x, dy, w, h per obstacle
+        self.type_ids = type_ids    # array('B')
+        self.source = source
+        self._starts = None         # segment width, array('I') of each segment's first obstacle
+
+    def obstacles(self):
+        """(type, x, dy, w, h) per obstacle."""
+        yield from self._run(0, len(self))
+
+    def segment(self, i, width):
+        """(type, x, dy, w, h) of the obstacles with x in segment i of the given width, by x."""
+        if self._starts is None or self._starts[0] != width:
+            starts = array("I")
+            for j, x in enumerate(self._xs()):
+                while len(starts) <= max(0, x // width):
+                    starts.append(j)
+            starts.append(len(self))
+            self._starts = width, starts
+        starts = self._starts[1]
+        if i + 1 < len(starts):
+            yield from self._run(starts[i], starts[i + 1])
+
+    def _xs(self):
+        """x of every obstacle, without keeping them all."""
+        for start in range(0, len(self), 4096):
+            rects, _ = self._read(start, min(start + 4096, len(self)))
+            yield from rects[::4]
+
+    def _run(self, start, stop):
+        r, type_ids = self._read(start, stop)
+        types = self.types
+        for i, t in enumerate(type_ids):
+            yield types[t], r[4*i], r[4*i+1], r[4*i+2], r[4*i+3]
+
+    def _read(self, start, stop):
+        """Rects and type ids of obstacles start to stop."""
+        if self.source is None:
+            return self.rects[4*start:4*stop], self.type_ids[start:stop]
+        cache, pos, n = self.source
+        rects = array("i")
+        with open(cache, "rb") as f:
+            f.seek(pos + 16*start)
+            rects.frombytes(f.read(16 * (stop - start)))
+            f.seek(pos + 16*n + start)
+            type_ids = array("B", f.read(stop - start))
+        if sys.byteorder == "big":
+            rects.byteswap()
+        return rects, type_ids
+
+    def __len__(self):
+        return self.source[2] if self.source is not None else len(self.type_ids)
+
+
+def compile_level(source):
+    """Parse JSON level source (str or bytes) into a LevelData."""
+    return from_dict(json.loads(source))
+
+
+def from_dict(level):
+    """LevelData from a level as parsed JSON, e.g. from levelgen."""
+    meta = dict(level)
+    obstacles = meta.pop("obstacles", [])
+    if meta.get("stream"):
+        obstacles = sorted(obstacles, key=lambda o: o[1])
+        meta.pop("hurdles", None)
+    type_index = {}
+    rects = array("i")
+    type_ids = array("B")
+    for typ, x, dy, w, h in obstacles:
+        if typ not in type_index:
+            type_index[typ] = len(type_index)
+        type_ids.append(type_index[typ])
+        rects.extend((x, dy, w, h))
+    meta["types"] = list(type_index)
+    return LevelData(meta, rects, type_ids)
+
+
+def cache_path(path):
+    folder, name = os.path.split(path)
+    return os.path.join(folder, "__cache__", os.path.splitext(name)[0] + ".bin")
+
+
+def _read_cache(cache, st, sha1=None):
+    """Cached LevelData if it was built from this source, else None."""
+    try:
+        with open(cache, "rb") as f:
+            magic, version, mtime_ns, size, digest, meta_len, n = _HEADER.unpack(f.read(_HEADER.size))
+            if magic != MAGIC or version != VERSION:
+                return None
+            if sha1 is None:
+                if (mtime_ns, size) != (st.st_mtime_ns, st.st_size):
+                    return None
+            elif digest != sha1:
+                return None
+            meta = json.loads(f.read(meta_len))
+            pos = _HEADER.size + meta_len
+            if meta.get("stream"):
+                # Obstacles stay in the file, segment() reads them
+                if os.fstat(f.fileno()).st_size != pos + 17*n:
+                    return None
+                return LevelData(meta, None, None, source=(cache, pos, n))
+            rects = array("i")
+            rects.frombytes(f.read(16*n))
+            type_ids = array("B", f.read(n))
+    except (OSError, ValueError, struct.error):
+        return None
+    if len(type_ids) != n:
+        return None
+    if sys.byteorder == "big":
+        rects.byteswap()
+    return LevelData(meta, rects, type_ids)
+
+
+def _write_cache(cache, st, sha1, data):
+    meta = json.dumps(data.meta, separators=(",", ":")).encode("utf-8")
+    rects, type_ids = data._read(0, len(data))
+    if sys.byteorder == "big":
+        rects.byteswap()
+    header = _HEADER.pack(MAGIC, VERSION, st.st_mtime_ns, st.st_size, sha1, len(meta), len(data))
+    tmp = cache + ".tmp"
+    try:
+        os.makedirs(os.path.dirname(cache), exist_ok=True)
+        with open(tmp, "wb") as f:
+            f.write(header + meta + rects.tobytes() + type_ids.tobytes())
+        os.replace(tmp, cache)
+    except OSError:
+        pass  # read-only install, compile every time
+
+
+def load(path):
+    """LevelData for a level file, from the cache when it is current."""
+    st = os.stat(path)
+    cache = cache_path(path)
+    data = _read_cache(cache, st)
+    if data is not None:
+        return data
+
+    with open(path, "rb") as f:
+        source = f.read()
+    sha1 = hashlib.sha1(source).digest()
+    # Touched but unchanged (e.g. a fresh checkout) keeps the compiled data
+    data = _read_cache(cache, st, sha1) or compile_level(source)
+    _write_cache(cache, st, sha1, data)
+    if data.stream and data.source is None:
+        return _read_cache(cache, st, sha1) or data  # read segments from the new cache
+    return data
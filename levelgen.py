@@ -0,0 +1,261 @@
+"""
+Seeded procedural levels.
+
+    python levelgen.py --screens 100 --seed 7 --out levels/gen.json
+    python levelgen.py --density spike=2,water=1 --out levels/dense.json
+    python levelgen.py --screens 5000 --stream --out levels/long.json
+
+Obstacles are grouped into hurdles: a window no wider than a running
+jump clears at the window's tallest obstacle, with enough run-up between
+hurdles to land and jump again. Heights and widths come from the jump
+arc simulated with the current JUMP_SPEED, GRAVITY and PLAYER_SPEED, so
+every generated level can be crossed by holding right and jumping at
+takeoffs(level). Any density fits: more obstacles per screen share the
+hurdles instead of crowding the run-up. The first screen is left free
+to start, the last one to meet the boss. Levels keep their hurdles as
+[x, width, height] under "hurdles", which the game ignores.
+
+endless_level() has no end: each screen is generated on its own by
+segment() when the camera gets near, seeded by the level seed and the
+screen index, and dropped again behind the camera (see stream.py).
+"""
+import argparse
+import functools
+import glob
+import json
+import random
+import sys
+
+import pygame
+
+import main as game
+import levelfile
+import physics
+
+DENSITY = {"spike": 0.5, "spring": 0.3, "platform": 0.3, "water": 0.5, "rotating": 0.3}  # per screen
+PLACEMENTS = 8          # background props
+CLOUDS = (1, 2)         # big, small per screen
+MIN_HEIGHT = 15         # obstacle height above the ground, px
+MAX_HEIGHT = 60
+MAX_SINK = 20           # extra height below the ground line
+MIN_WIDTH = 20
+MAX_WIDTH = 100
+RUN_UP = (10, 120)      # px of flat ground between landing and the next takeoff
+PROP_PATHS = sorted(glob.glob("sprites/background/level1/*.png") + glob.glob("sprites/background/level2/*.png"))
+
+
+def jump_arc():
+    """Height of the player's bottom above the ground after each step of a jump, as World.step moves it."""
+    ground = game.GROUND_Y - physics.PLAYER_HEIGHT
+    player = pygame.Rect(0, ground, physics.PLAYER_WIDTH, physics.PLAYER_HEIGHT)
+    vel = physics.JUMP_SPEED
+    heights = [0]
+    while True:
+        vel += physics.GRAVITY
+        player.y += vel
+        if player.y >= ground:
+            return heights + [0]
+        heights.append(ground - player.y)
+
+
+@functools.lru_cache(maxsize=None)
+def clear_window(height):
+    """
+    (first, last) jump step during which the player is safely above height:
+    both the horizontal check (before gravity) and the vertical one (after)
+    of every step in between see the player higher than that. None if the
+    jump never gets that high.
+    """
+    arc = jump_arc()
+    safe = [k for k in range(1, len(arc)) if min(arc[k - 1], arc[k]) > height]
+    return (safe[0], safe[-1]) if safe else None
+
+
+def hurdle_width(height):
+    """Widest window of obstacles up to height a running jump clears, negative if none."""
+    window = clear_window(height)
+    if window is None:
+        return -1
+    first, last = window
+    return (last - first) * physics.PLAYER_SPEED - physics.PLAYER_WIDTH
+
+
+def takeoff(x, height):
+    """
+    Player x from which to jump (on the first frame at or past it) to clear
+    a hurdle starting at x with obstacles up to height.
+    """
+    first, _ = clear_window(height)
+    return x - physics.PLAYER_WIDTH - first * physics.PLAYER_SPEED
+
+
+def air_width():
+    """
+    Run-up a jump takes from takeoff to the next possible takeoff: jumping
+    starts up to a step late (first frame past the takeoff) and the player
+    can jump again on the step after landing.
+    """
+    return len(jump_arc()) * physics.PLAYER_SPEED
+
+
+def place_hurdles(rng, jump_at, end):
+    """Hurdles [x, width, height] taken off from jump_at on, each ending before end."""
+    if hurdle_width(MIN_HEIGHT) < MIN_WIDTH:
+        raise ValueError("JUMP_SPEED/GRAVITY too weak to clear the smallest obstacle")
+    air = air_width()
+    hurdles = []
+    while True:
+        height = rng.randint(MIN_HEIGHT, MAX_HEIGHT)
+        while hurdle_width(height) < MIN_WIDTH:
+            height -= 1
+        w = rng.randint(MIN_WIDTH, min(MAX_WIDTH, hurdle_width(height)))
+        first, _ = clear_window(height)
+        x = jump_at + physics.PLAYER_WIDTH + first * physics.PLAYER_SPEED  # takeoff(x, height) == jump_at
+        if x + w > end:
+            break
+        hurdles.append([x, w, height])
+        jump_at = jump_at + air + rng.randint(*RUN_UP)
+    return hurdles
+
+
+def fill_hurdles(rng, hurdles, kinds):
+    """One obstacle [type, x, dy, w, h] per name in kinds, spread over the hurdles, sorted by x."""
+    rng.shuffle(kinds)
+    obstacles = []
+    for i, name in enumerate(kinds):
+        hx, hw, hh = hurdles[i * len(hurdles) // len(kinds)]
+        w = rng.randint(MIN_WIDTH, hw)
+        above = rng.randint(MIN_HEIGHT, hh)
+        obstacles.append([name, hx + rng.randint(0, hw - w), -above, w, above + rng.randint(0, MAX_SINK)])
+    obstacles.sort(key=lambda o: o[1])
+    return obstacles
+
+
+def background(rng, placements):
+    """One screen-wide background layer with random props."""
+    props = []
+    for _ in range(placements if PROP_PATHS else 0):
+        pw = rng.randint(40, 130)
+        ph = rng.randint(40, 130)
+        props.append([rng.choice(PROP_PATHS), rng.randint(-200, game.WIDTH + 200 - pw),
+                      game.GROUND_Y - ph, pw, ph])
+    return {
+        "x": -game.BG_PARALLAX_LIMIT,
+        "width": game.WIDTH + 2 * game.BG_PARALLAX_LIMIT,
+        "shift": 1.0,
+        "fill": [rng.randint(90, 170), rng.randint(80, 140), rng.randint(50, 110)],
+        "placements": props,
+    }
+
+
+def generate(seed=0, screens=game.SCREENS_PER_LEVEL, density=None, placements=PLACEMENTS,
+             clouds=CLOUDS, boss="enemy"):
+    """A level as parsed level JSON (see levelfile.py)."""
+    rng = random.Random(seed)
+    density = DENSITY if density is None else density
+    width = game.WIDTH * screens
+
+    # Hurdle windows from the second screen to the boss screen
+    hurdles = place_hurdles(rng, game.WIDTH, width - game.WIDTH)
+    kinds = [name for name, per_screen in density.items() for _ in range(round(per_screen * screens))]
+    if kinds and not hurdles:
+        raise ValueError(f"{screens} screens leave no room for obstacles")
+    obstacles = fill_hurdles(rng, hurdles, kinds)
+
+    big, small = clouds
+    return {
+        "screens": screens,
+        "boss": boss,
+        "obstacle_sprites": "sprites/obstacles/level1",
+        "background": [background(rng, placements)],
+        "clouds": {
+            "big": [[rng.randrange(width), rng.randint(20, 120)] for _ in range(big * screens)],
+            "small": [[rng.randrange(width), rng.randint(40, 160)] for _ in range(small * screens)],
+        },
+        "obstacles": obstacles,
+        "hurdles": hurdles,
+    }
+
+
+def generated_level(**kwargs):
+    """A main.Level for generate(**kwargs), e.g. for Level-based benchmarks."""
+    return game.level_from_data(levelfile.from_dict(generate(**kwargs)))
+
+
+def segment(seed, i, density=None):
+    """
+    Screen i of an endless level as {"obstacles": [...], "hurdles": [...]}
+    in generate()'s format, always the same for the same seed. Every jump
+    lands within its screen, so screens join up. Fractional densities are
+    the chance of one more obstacle. Screen 0 is left free to start.
+    """
+    if i == 0:
+        return {"obstacles": [], "hurdles": []}
+    rng = random.Random(f"{seed}:{i}")
+    density = DENSITY if density is None else density
+    hurdles = place_hurdles(rng, i * game.WIDTH, (i + 1) * game.WIDTH - air_width())
+    kinds = [name for name, per_screen in density.items()
+             for _ in range(int(per_screen) + (rng.random() < per_screen % 1))]
+    return {"obstacles": fill_hurdles(rng, hurdles, kinds) if kinds else [], "hurdles": hurdles}
+
+
+def endless_level(seed=0, density=None, placements=PLACEMENTS, clouds=CLOUDS):
+    """A streamed main.Level without end or boss, its screens made by segment()."""
+    rng = random.Random(seed)
+    big, small = clouds
+    left, right = -game.CLOUD_MARGIN, game.WIDTH
+    meta = {
+        "screens": None,
+        "boss": None,
+        "obstacle_sprites": "sprites/obstacles/level1",
+        "background": [background(rng, placements)],
+        "clouds": {
+            "big": [[rng.randrange(left, right), rng.randint(20, 120)] for _ in range(big)],
+            "small": [[rng.randrange(left, right), rng.randint(40, 160)] for _ in range(small)],
+        },
+    }
+    return game.level_from_data(levelfile.from_dict(meta),
+                                segments=lambda i: segment(seed, i, density)["obstacles"])
+
+
+def endless_takeoffs(seed, screens, density=None):
+    """takeoffs() of the first screens of endless_level(seed, density)."""
+    return [takeoff(x, height) for i in range(screens) for x, _, height in segment(seed, i, density)["hurdles"]]
+
+
+def takeoffs(level):
+    """Player x of every jump needed to cross a generate() level, in order."""
+    return [takeoff(x, height) for x, _, height in level["hurdles"]]
+
+
+def parse_density(text):
+    density = {}
+    for item in text.split(","):
+        name, _, value = item.partition("=")
+        density[name.strip()] = float(value)
+    return density
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--screens", type=int, default=game.SCREENS_PER_LEVEL)
+    parser.add_argument("--density", type=parse_density, help="obstacles per screen, e.g. spike=1,water=0.5")
+    parser.add_argument("--placements", type=int, default=PLACEMENTS, help="background props")
+    parser.add_argument("--clouds", default=",".join(map(str, CLOUDS)), help="big,small clouds per screen")
+    parser.add_argument("--stream", action="store_true", help="mark the level to be loaded a screen at a time")
+    parser.add_argument("--out", required=True, help="level JSON to write")
+    args = parser.parse_args()
+
+    clouds = tuple(int(n) for n in args.clouds.split(","))
+    level = generate(args.seed, args.screens, args.density, args.placements, clouds)
+    if args.stream:
+        level["stream"] = True
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(level, f, ensure_ascii=False)
+    print(f"{args.out}: {args.screens} screens, {len(level['obstacles'])} obstacles")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,21 +2,58 @@ import pygame
 import sys
 import os
 import glob
+import functools
+import time
+import argparse
+
+from assets import AssetManager, TextCache
+from spatial import SpatialGrid
+from stream import LevelStream
+from obstacles import Obstacles
+from entities import Entities
+import physics
+from physics import PLAYER_WIDTH, PLAYER_HEIGHT, EFFECTS
+from background import Background, Layer
+from animation import Clip, Animator
+import levelfile
+import atlas
+from render import Presenter, BACKENDS, normalize
+from inputs import LiveInput
+from profiler import NullProfiler, Profiler, CProfileCapture
+from overlay import PerfOverlay
 
 # --- Config ---
 WIDTH, HEIGHT = 800, 480
-FPS = 60
-GROUND_Y = HEIGHT - 60
-
-GRAVITY = 0.5
-JUMP_SPEED = -10
-
-PLAYER_WIDTH, PLAYER_HEIGHT = int(40 * 1.3), int(60 * 1.4)
-PLAYER_SPEED = 5
+GROUND_Y = HEIGHT - 60   # Top of the ground, physics reads it as World.ground_y
+FPS = 60                 # Render cap, 0 = uncapped
+SIM_HZ = 60              # Fixed simulation rate, physics constants are per step
+STEP_MS = 1000 / SIM_HZ
+MAX_STEPS_PER_FRAME = 5  # Catch-up limit, slower machines run slow-mo instead of spiralling
+INTERPOLATE = True       # Draw between the last two simulation steps
+DIRTY_RECTS = False      # Only push changed screen areas to the display
+RENDERER = "surface"     # "sdl2": show frames through a pygame._sdl2 software Renderer (render.py), or --renderer
+IDLE_FPS = 0             # Render rate once nothing changed for IDLE_AFTER_MS, 0 = never throttle (e.g. 15)
+IDLE_AFTER_MS = 1000
+FPS_READOUT_MS = 500     # HUD FPS counter refresh interval
+OVERLAY_KEY = pygame.K_F3   # Performance overlay on/off, records frames while on
+TRACE_KEY = pygame.K_F5     # Write the recorded frames as JSON and CSV
+CPROFILE_KEY = pygame.K_F6  # Start/stop a cProfile capture
+ASSETS_KEY = pygame.K_F7    # Print resident assets, their memory and load time
+PROFILE_HISTORY = 300       # Frames kept for the overlay and traces
+PROFILE_DIR = "profiles"
+GAME_KEYS = (pygame.K_LEFT, pygame.K_RIGHT, pygame.K_DOWN, pygame.K_SPACE, pygame.K_f, pygame.K_r)  # Recorded in replays
+# Gravity, jump and player size/speed: see physics.py
 CROUCH_FACTOR = 0.5
+WALK_FRAME_MS = 100  # Player animation speed per state
+JUMP_FRAME_MS = 60
 
-SCREENS_PER_LEVEL = 3
-LEVEL_WIDTH = WIDTH * SCREENS_PER_LEVEL
+SCREENS_PER_LEVEL = 3  # Default for levels that don't say
+GRID_CELL_SIZE = WIDTH // 4  # Broad-phase bucket width for obstacle collision
+STREAM_AHEAD = 2            # Streamed levels: screens loaded past the camera's right edge
+STREAM_BEHIND = 1           # ... and kept left of it, the rest is dropped
+CLOUD_MARGIN = 200          # Clouds wrap once this far off the left edge
+BG_PARALLAX_LIMIT = 200     # Max background parallax offset in px
+LEVEL_TRANSITION_MS = 2000  # Minimum time the "Level N" card is shown
 
 ENEMY_WIDTH, ENEMY_HEIGHT = int(66 * 1.3), int(90 * 1.4)
 
@@ -26,517 +63,883 @@ OBSTACLE_COLOR = (150, 75, 0)
 WATER_COLOR    = (255, 255, 0)
 TEXT_COLOR     = (255, 255, 255)
 
-# --- Obstacle Image Registry ---
+# --- Obstacle Type Registry ---
+# deadly: touching it sends the player back to the start
+# effect: name in EFFECTS, applied when the player touches it after gravity
+# Types not listed here are plain solid blocks.
 OBSTACLE_TYPES = {
-    "spike":     {"img": "./sprites/obstacle/papertowel.png",     "color": (150, 150, 0)},
-    "spring":    {"img": "sprites/map/spring.png",    "color": (120, 200, 120)},
-    "platform":  {"img": "sprites/map/platform.png",  "color": (80, 80, 80)},
-    "water":     {"img": "sprites/map/water.png",     "color": (100, 200, 255)},
-    "rotating":  {"img": "sprites/map/rotating.png",  "color": (120, 120, 200)},
+    "spike":     {"img": "./sprites/obstacle/papertowel.png",     "color": (150, 150, 0), "deadly": True},
+    "spring":    {"img": "sprites/map/spring.png",    "color": (120, 200, 120), "effect": "spring"},
+    "platform":  {"img": "sprites/map/platform.png",  "color": (80, 80, 80),    "effect": "platform"},
+    "water":     {"img": "sprites/map/water.png",     "color": (100, 200, 255), "effect": "water"},
+    "rotating":  {"img": "sprites/map/rotating.png",  "color": (120, 120, 200), "effect": "rotating"},
     # add more as needed
 }
 
-def load_obstacle_images():
-    images = {}
-    for typ, entry in OBSTACLE_TYPES.items():
-        path = entry.get("img")
-        if path and os.path.exists(path):
-            try:
-                img = pygame.image.load(path).convert_alpha()
-                images[typ] = img
-            except Exception:
-                images[typ] = None
-        else:
-            images[typ] = None
-    return images
-
-pygame.init()
-screen = pygame.display.set_mode((WIDTH, HEIGHT))
-pygame.display.set_caption("Street‐Mario mit Sprite")
-clock = pygame.time.Clock()
-font = pygame.font.SysFont(None, 24)
-
-OBSTACLE_IMAGES = load_obstacle_images()
+# --- Asset paths ---
+def frame_paths(folder, prefix, num_frames):
+    """Paths like folder/prefix1.png ... folder/prefixN.png"""
+    return [os.path.join(folder, f"{prefix}{i}.png") for i in range(1, num_frames + 1)]
+
+WALK_PATHS   = frame_paths("sprites/player/walk", "walk", 6)
+JUMP_PATHS   = frame_paths("sprites/player/jump", "jump", 6)
+CROUCH_PATHS = frame_paths("sprites/player/crouch", "crouch", 1)
+FIGHT_PATHS  = frame_paths("sprites/fight", "fight", 3)
+ENEMY_PATH   = 'sprite_enemy.png'
+CLOUD_PATH   = './sprites/map/cloud.png'
+ATLAS_MANIFEST = atlas.MANIFEST  # built by atlas.py, loose files are used without it
+
+# --- Entity Type Registry ---
+# size: (w, h), frames: sprite paths, frame_ms per frame, dy: draw offset
+# speed: px per step while patrolling
+# battle: touching it starts a fight, the level ends once all are beaten
+# deadly / effect: as for obstacles
+ENTITY_TYPES = {
+    "enemy":    {"size": (ENEMY_WIDTH, ENEMY_HEIGHT), "frames": [ENEMY_PATH], "dy": 30,
+                 "color": (50, 200, 50), "battle": True},
+    "big_boss": {"size": (ENEMY_WIDTH*2, ENEMY_HEIGHT*2), "dy": 30, "color": (40, 220, 40), "battle": True},
+    "patrol":   {"size": (ENEMY_WIDTH//2, ENEMY_HEIGHT//2), "frames": [ENEMY_PATH], "dy": 30,
+                 "color": (200, 60, 60), "speed": 2, "deadly": True},
+    "rotating": {"size": (60, 60), "color": (120, 120, 200), "speed": 3, "effect": "rotating"},
+}
 
-def load_image_safe(path, size=None):
-    try:
-        img = pygame.image.load(path).convert_alpha()
-        if size:
-            img = pygame.transform.scale(img, size)
+# Needed by every level, decoded while the intro is shown
+STARTUP_ASSETS = (WALK_PATHS + JUMP_PATHS + CROUCH_PATHS + FIGHT_PATHS
+                  + [CLOUD_PATH]
+                  + sorted({p for e in ENTITY_TYPES.values() for p in e.get("frames", ())}))
+
+# Set up by init()
+screen = None
+backend = None
+clock = None
+font = None
+headless = False
+sync_loading = False  # set by run() for recorded and replayed input
+profiler = NullProfiler()
+
+def log_load(path, error):
+    if error is None:
         print(f"{path} erfolgreich geladen!")
-        return img
-    except Exception as e:
-        print(f"Warnung: {path} konnte nicht geladen werden: {e}")
-        return None
-
-enemy_image = load_image_safe('sprite_enemy.png', (ENEMY_WIDTH, ENEMY_HEIGHT))
-cloud_img_big = load_image_safe('./sprites/map/cloud.png', (120, 60))
-cloud_img_small = pygame.transform.scale(cloud_img_big, (60, 30)) if cloud_img_big else None
-
-bg_image2 = load_image_safe('./sprites/map/forest.png', (WIDTH, HEIGHT))  # Optional
-bg_image3 = load_image_safe('./sprites/map/mountain.png', (WIDTH, HEIGHT)) # Optional
+    else:
+        print(f"Warnung: {path} konnte nicht geladen werden: {error}")
+
+text_cache = TextCache(prepare=normalize)
+assets = AssetManager(prepare=normalize, on_load=log_load)  # also the registry of resident surfaces
+
+def init(headless_mode=False, renderer=None):
+    """
+    Open the window, load the levels and start decoding the shared sprites.
+    headless_mode renders into an offscreen dummy display and loads assets
+    synchronously, so scripted runs are frame-exact. renderer overrides
+    RENDERER.
+    """
+    global screen, backend, clock, font, headless
+    headless = headless_mode
+    if headless:
+        os.environ["SDL_VIDEODRIVER"] = "dummy"
+        os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+    pygame.init()
+    name = renderer or RENDERER
+    try:
+        backend = BACKENDS[name]()
+    except ImportError as e:
+        print(f"Warnung: Renderer {name} nicht verfügbar ({e}), nehme surface")
+        backend = BACKENDS["surface"]()
+    screen = backend.open((WIDTH, HEIGHT), "Street‐Mario mit Sprite")
+    clock = pygame.time.Clock()
+    font = pygame.font.SysFont(None, 24)
+    assets.load_atlas(atlas.read_manifest(ATLAS_MANIFEST))
+    assets.claim("startup", STARTUP_ASSETS)
+    assets.prefetch(STARTUP_ASSETS)
+    load_levels()
+    prefetch_level(0)
+
+def render_text(text, color=TEXT_COLOR):
+    """Rasterizes text only the first time a string is seen."""
+    return text_cache.render(font, text, color)
+
+def assets_ready(paths):
+    """Whether paths are decoded. Headless and recorded runs wait for them instead."""
+    if headless or sync_loading:
+        for path in paths:
+            assets.get(path)
+        return True
+    return assets.ready(paths)
+
+def load_image_safe(path, size=None, flip_x=False):
+    """Shared variant of path, None if it failed to load (log_load reports it once)."""
+    return assets.variant(path, size, flip_x)
 
 # --- Animation frame loaders ---
-def load_animation_frames(folder, prefix, num_frames):
-    """Load frames like folder/prefix1.png ... folder/prefixN.png"""
+def load_animation_frames(paths, size=(PLAYER_WIDTH, PLAYER_HEIGHT), flip_x=False):
     frames = []
-    for i in range(1, num_frames + 1):
-        fname = os.path.join(folder, f"{prefix}{i}.png")
-        if not os.path.exists(fname):
+    for fname in paths:
+        img = assets.variant(fname, size, flip_x)
+        if img is None:
             raise Exception(f"Missing file: {fname}")
-        img = pygame.image.load(fname).convert_alpha()
-        img = pygame.transform.scale(img, (PLAYER_WIDTH, PLAYER_HEIGHT))
         frames.append(img)
     return frames
 
-# Walk, Jump, Crouch Animation (6/6/1 frames each)
-walk_frames_r = load_animation_frames("sprites/player/walk", "walk", 6)
-walk_frames_l = [pygame.transform.flip(f, True, False) for f in walk_frames_r]
-jump_frames_r = load_animation_frames("sprites/player/jump", "jump", 6)
-jump_frames_l = [pygame.transform.flip(f, True, False) for f in jump_frames_r]
-crouch_frames_r =  load_animation_frames("sprites/player/crouch", "crouch", 1)
-crouch_frames_l = [pygame.transform.flip(f, True, False) for f in crouch_frames_r]
-
-# --- Fight Animation Frames ---
-def load_fight_frames(folder, prefix, num_frames):
-    frames = []
-    for i in range(1, num_frames + 1):
-        fname = os.path.join(folder, f"{prefix}{i}.png")
-        if not os.path.exists(fname):
-            raise Exception(f"Missing fight file: {fname}")
-        img = pygame.image.load(fname).convert_alpha()
-        img = pygame.transform.scale(img, (180, 140))
-        frames.append(img)
-    return frames
-
-fight_frames = load_fight_frames("sprites/fight", "fight", 3)
-
 # --- Classes for modular levels ---
 class Level:
-    def __init__(self, background_draw_func, obstacle_factory, boss_factory=None, clouds=None):
-        self.background_draw_func = background_draw_func
+    """
+    segments: the obstacles are streamed a screen at a time instead of
+    built by obstacle_factory, see stream.LevelStream. screens=None makes
+    the level endless, it has no width then. Clouds of streamed levels
+    wrap around the screen instead of the level, so only the first
+    screen's are kept.
+    """
+    def __init__(self, background, obstacle_factory, entity_factory=None, clouds=None,
+                 asset_paths=(), screens=SCREENS_PER_LEVEL, segments=None):
+        self.background = background  # Background, baked on first draw
         self.obstacle_factory = obstacle_factory
-        self.boss_factory = boss_factory or (lambda: None)
+        self.entity_factory = entity_factory or new_entities
+        self.segments = segments  # LevelStream source: segments(i) -> (type, x, y, w, h, sprite path) of screen i
+        self.asset_paths = list(asset_paths)  # prefetched while the previous level is played
+        self.screens = screens
+        self.width = WIDTH * screens if screens else None
+        if segments:
+            self.cloud_span = WIDTH + CLOUD_MARGIN
+            clouds = clouds and [[c for c in layer if c[0] < self.cloud_span] for layer in clouds]
+        else:
+            self.cloud_span = (self.width or WIDTH) + CLOUD_MARGIN
         self.clouds = clouds
 
-def load_background_images(folder):
-    images = []
-    paths = sorted(glob.glob(os.path.join(folder, "*.png")))
-    for path in paths:
-        try:
-            img = pygame.image.load(path).convert_alpha()
-            images.append(img)
-        except Exception as e:
-            print(f"Could not load {path}: {e}")
-    return images
-
-bg_apartment_images = load_background_images("sprites/background/level1")
-bg_apartment_placements = [
-    (80, 340, 80, 80),
-    (190, 300, 120, 120),
-    (350, 350, 40, 70),
-    (420, 280, 70, 70),
-    (550, 360, 60, 60),
-    (650, 260, 130, 130),
-    (750, 350, 50, 70),
-    (840, 360, 60, 60)
-]
-
-def bg_apartment(screen, cam_x, bg_offset=0):
-    screen.fill((163, 111, 64))
-    offset = int(bg_offset)
-    for i, img in enumerate(bg_apartment_images):
-        if i < len(bg_apartment_placements):
-            x, y, w, h = bg_apartment_placements[i]
-            x = x + offset  # Parallax effect
-            img_scaled = pygame.transform.scale(img, (w, h))
-            screen.blit(img_scaled, (x, y))
-
-def bg_parallax_forest(screen, cam_x):
-    if bg_image2:
-        screen.blit(bg_image2, (0,0))
-    else:
-        screen.fill((80, 140, 80))
-
-def bg_park(screen, cam_x):
-    screen.fill((120, 200, 110))
-    for x in range(0, WIDTH, 200):
-        pygame.draw.rect(screen, (110, 70, 20), (x+80, GROUND_Y - 70, 10, 60))
-        pygame.draw.ellipse(screen, (34,139,34), (x+60, GROUND_Y - 100, 50, 50))
-
-def load_obstacle_image(level, obstype):
-    folder = f"sprites/obstacles/level{level}/{obstype}"
+@functools.lru_cache(maxsize=None)
+def find_obstacle_image(folder, obstype):
     for img_name in [f"{obstype}1.png", f"{obstype}.png", "1.png"]:
-        img_path = os.path.join(folder, img_name)
+        img_path = os.path.join(folder, obstype, img_name)
         if os.path.exists(img_path):
-            try:
-                return pygame.image.load(img_path).convert_alpha()
-            except Exception:
-                pass
-    return None  # fallback will be used in drawing
-
-def create_obstacles_lvl1():
-    obs = []
-    def add_obstacle(x, y, w, h, typ):
-        img = load_obstacle_image(1, typ)
-        obs.append({'rect': pygame.Rect(x, y, w, h), 'type': typ, 'img': img})
-    add_obstacle(150, GROUND_Y - 20, 100, 66, 'spikes')
-    add_obstacle(350, GROUND_Y-20, 50, 50, 'spring')
-    add_obstacle(480, GROUND_Y-20, 60, 60, 'water')
-    add_obstacle(530, GROUND_Y-25, 70, 70, 'water')
-    add_obstacle(580, GROUND_Y-15, 50, 50, 'water')
-    off = WIDTH
-    add_obstacle(off+200, GROUND_Y-20, 100, 66, 'spikes')
-    add_obstacle(off+600, GROUND_Y-30, 90, 90, 'rotating')
-    return obs
-
-def create_obstacles_lvl2():
-    obs = []
-    obs.append({'rect': pygame.Rect(100, GROUND_Y-60, 200, 20), 'type': 'platform'})
-    obs.append({'rect': pygame.Rect(350, GROUND_Y-30, 40, 30),  'type': 'spring'})
-    obs.append({'rect': pygame.Rect(700, GROUND_Y-60, 60, 20),  'type': 'rotating'})
-    return obs
-
-def create_obstacles_lvl3():
-    obs = []
-    obs.append({'rect': pygame.Rect(100, GROUND_Y-10, 100, 10), 'type': 'spike'})
-    obs.append({'rect': pygame.Rect(300, GROUND_Y-120, 80, 20),'type': 'platform'})
-    obs.append({'rect': pygame.Rect(350, GROUND_Y-30, 40, 20),  'type': 'spring'})
-    obs.append({'rect': pygame.Rect(600, GROUND_Y-5, 200, 10), 'type': 'water'})
-    return obs
-
-def spawn_enemy():
-    x = WIDTH*(SCREENS_PER_LEVEL-1) + WIDTH//2 - ENEMY_WIDTH//2
+            return img_path
+    return None
+
+def new_obstacles():
+    return Obstacles(OBSTACLE_TYPES, EFFECTS)
+
+def add_obstacle(obs, typ, x, y, w, h, path=None):
+    """Sprite at path scaled to the obstacle once, shared by all of that size. No path: color fill."""
+    return obs.add(typ, x, y, w, h, assets.variant(path, (w, h)) if path else None)
+
+def new_entities():
+    return Entities(ENTITY_TYPES, EFFECTS)
+
+def spawn_enemy(screens=SCREENS_PER_LEVEL):
+    x = WIDTH*(screens-1) + WIDTH//2 - ENEMY_WIDTH//2
     y = GROUND_Y - ENEMY_HEIGHT + 10
     return pygame.Rect(x, y, ENEMY_WIDTH, ENEMY_HEIGHT)
 
-def spawn_big_boss():
-    x = WIDTH*(SCREENS_PER_LEVEL-1) + WIDTH//2 - ENEMY_WIDTH
+def spawn_big_boss(screens=SCREENS_PER_LEVEL):
+    x = WIDTH*(screens-1) + WIDTH//2 - ENEMY_WIDTH
     y = GROUND_Y - ENEMY_HEIGHT
     return pygame.Rect(x, y, ENEMY_WIDTH*2, ENEMY_HEIGHT*2)
 
-# --- Levels ---
-levels = [
-    Level(
-        background_draw_func=bg_apartment,
-        obstacle_factory=create_obstacles_lvl1,
-        boss_factory=spawn_enemy,
-        clouds=None
-    ),
-    Level(
-        background_draw_func=bg_parallax_forest,
-        obstacle_factory=create_obstacles_lvl2,
-        boss_factory=spawn_enemy,
-        clouds=[[[150, 100], [550, 90], [900, 110]],
-                [[320, 60], [700, 80], [1000, 50]]]
-    ),
-    Level(
-        background_draw_func=bg_park,
-        obstacle_factory=create_obstacles_lvl3,
-        boss_factory=spawn_big_boss,
-        clouds=[[[200, 60], [500, 90], [950, 110]],
-                [[350, 30], [700, 80], [1000, 100]]]
-    ),
-]
-NUM_LEVELS = len(levels)
-
-def show_intro():
-    intro = [
-        "Es ist ein ganz normaler Morgen an der Universität.",
-        "Leon macht sich auf den Weg…",
-        "Drücke [Leertaste], um zu starten..."
-    ]
-    screen.fill(BG_COLOR)
-    for i, line in enumerate(intro):
-        text = font.render(line, True, TEXT_COLOR)
-        x = WIDTH//2 - text.get_width()//2
-        y = 60 + i*30
-        screen.blit(text, (x, y))
-    pygame.display.flip()
-    waiting = True
-    while waiting:
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                pygame.quit(); sys.exit()
-            if event.type == pygame.KEYDOWN and event.key == pygame.K_SPACE:
-                waiting = False
-        clock.tick(FPS)
-
-show_intro()
-
-current_level_idx = 0
-level = levels[current_level_idx]
+BOSSES = {
+    "enemy":    spawn_enemy,
+    "big_boss": spawn_big_boss,
+}
 
-def clone_clouds(cloud_lists):
-    return [ [c[0], c[1]] for c in cloud_lists[0] ], [ [c[0], c[1]] for c in cloud_lists[1] ]
+# --- Level files (see levelfile.py for the format) ---
+SHAPES = {"rect": pygame.draw.rect, "ellipse": pygame.draw.ellipse}
 
-obstacles = level.obstacle_factory()
-enemy = level.boss_factory()
-enemy_alive = True
-in_battle = False
-
-player = pygame.Rect(-PLAYER_WIDTH, GROUND_Y-PLAYER_HEIGHT, PLAYER_WIDTH, PLAYER_HEIGHT)
-player_vel_y = 0
-
-big_clouds, small_clouds = clone_clouds(level.clouds) if level.clouds else ([], [])
-
-anim_state = "idle"
-anim_timer = 0
-anim_frame = 0
-bg_offset = 0  # For apartment parallax
-
-jump_anim_progress = 0
-jump_anim_playing = False
-
-# --- Fight Animation State ---
-fight_anim_active = False
-fight_anim_start = 0
-fight_anim_frame = 0
-fight_anim_loops = 5  # Loop through frames 5 times
-fight_anim_total_frames = len(fight_frames) * fight_anim_loops
-fight_anim_duration = 2000  # ms
-fight_anim_done = False
-
-running = True
-
-while running:
-    dt = clock.tick(FPS)
-    now = pygame.time.get_ticks()
-
-    # --- Events ---
-    for e in pygame.event.get():
-        if e.type == pygame.QUIT:
-            running = False
-        if in_battle and e.type == pygame.KEYDOWN:
-            if e.key == pygame.K_f:
-                enemy_alive = False; in_battle = False
-                fight_anim_active = True
-                fight_anim_start = pygame.time.get_ticks()
-                fight_anim_frame = 0
-            if e.key == pygame.K_r:
-                player.x = -PLAYER_WIDTH; in_battle = False
-        if not in_battle and e.type == pygame.KEYDOWN:
-            if e.key == pygame.K_SPACE and player_vel_y == 0:
-                player_vel_y = JUMP_SPEED
-
-    keys = pygame.key.get_pressed()
-    old_x, old_y = player.x, player.y
-
-    if not in_battle and not fight_anim_active:
-        # Movement
-        if keys[pygame.K_LEFT]:
-            player.x = max(-PLAYER_WIDTH, player.x - PLAYER_SPEED)
-        if keys[pygame.K_RIGHT]:
-            player.x += PLAYER_SPEED
-
-        # Horizontal collision
-        for o in obstacles:
-            r = o['rect']
-            if player.colliderect(r):
-                if o['type']=='spike':
-                    player.x = -PLAYER_WIDTH; player_vel_y = 0
-                    break
-                if old_x < player.x:
-                    player.x = r.x - PLAYER_WIDTH
-                else:
-                    player.x = r.x + r.width
-
-        # Gravity
-        player_vel_y += GRAVITY
-        player.y += player_vel_y
-
-        # Vertical collision/effects
-        for o in obstacles:
-            r, t = o['rect'], o['type']
-            if player.colliderect(r):
-                if t == 'spike':
-                    player.x = -PLAYER_WIDTH; player_vel_y = 0; break
-                if t == 'spring':
-                    player_vel_y = JUMP_SPEED * 1.5
-                    player.bottom = r.top
-                if t == 'platform' and old_y + PLAYER_HEIGHT <= r.top:
-                    player.bottom = r.top
-                    player_vel_y = 0
-                if t == 'water':
-                    player.x -= PLAYER_SPEED * 0.5
-                if t == 'rotating':
-                    player.x -= PLAYER_SPEED * 2
+def background_layer(spec):
+    x = spec.get("x", 0)
 
-        # Ground
-        if player.y >= GROUND_Y - PLAYER_HEIGHT:
-            player.y = GROUND_Y - PLAYER_HEIGHT
-            player_vel_y = 0
+    def paint(surf):
+        if "fill" in spec:
+            surf.fill(spec["fill"])
+        img = assets.get(spec["image"]) if "image" in spec else None
+        if img:
+            surf.blit(pygame.transform.scale(img, surf.get_size()), (0, 0))
+        for kind, color, rect in spec.get("shapes", ()):
+            SHAPES[kind](surf, color, pygame.Rect(rect).move(-x, 0))
+        for path, px, py, w, h in spec.get("placements", ()):
+            img = assets.get(path)
+            if img:
+                surf.blit(pygame.transform.scale(img, (w, h)), (px - x, py))
+
+    return Layer(paint, (spec.get("width", WIDTH), HEIGHT), x=x, opaque="fill" in spec,
+                 scroll=spec.get("scroll", 0.0), shift=spec.get("shift", 0.0))
+
+def level_from_file(path):
+    return level_from_data(levelfile.load(path))
+
+def level_from_data(data, segments=None):
+    """Level from a levelfile.LevelData, streamed if it says so or segments is given."""
+    folder = data.obstacle_sprites
+
+    def obstacle_factory():
+        obs = new_obstacles()
+        for typ, x, dy, w, h in data.obstacles():
+            path = find_obstacle_image(folder, typ) if folder else None
+            add_obstacle(obs, typ, x, GROUND_Y + dy, w, h, path)
+        return obs
+
+    def entity_factory():
+        ents = new_entities()
+        if data.boss:
+            r = BOSSES[data.boss](data.screens)
+            ents.add(data.boss, r.x, r.y, size=r.size)
+        for typ, x, dy, patrol in data.entities:
+            ents.add(typ, x, GROUND_Y + dy, patrol)
+        return ents
+
+    asset_paths = []
+    for spec in data.background:
+        if "image" in spec:
+            asset_paths.append(spec["image"])
+        asset_paths += [p[0] for p in spec.get("placements", ())]
+    if folder:
+        asset_paths += sorted(glob.glob(os.path.join(folder, "*", "*.png")))
+
+    if segments is None and data.stream:
+        segments = functools.partial(data.segment, width=WIDTH)
+
+    def segment(i):
+        obstacles = segments(i)
+        if obstacles is None:
+            return None
+        return [(typ, x, GROUND_Y + dy, w, h, find_obstacle_image(folder, typ) if folder else None)
+                for typ, x, dy, w, h in obstacles]
+
+    clouds = data.clouds
+    return Level(
+        background=Background(*[background_layer(spec) for spec in data.background]),
+        obstacle_factory=obstacle_factory,
+        entity_factory=entity_factory,
+        clouds=[clouds["big"], clouds["small"]] if clouds else None,
+        asset_paths=asset_paths,
+        screens=data.screens,
+        segments=segment if segments else None
+    )
 
-        # Encounter
-        if enemy_alive and player.colliderect(enemy):
-            in_battle = True
+# --- Levels ---
+LEVEL_FILES = ["levels/level1.json", "levels/level2.json", "levels/level3.json"]
+levels = []  # Level per LEVEL_FILES entry, filled by load_levels()
+NUM_LEVELS = len(LEVEL_FILES)
+
+def load_levels():
+    """Load the level files once, compiling their caches if needed (see levelfile.py)."""
+    if not levels:
+        levels.extend(level_from_file(path) for path in LEVEL_FILES)
+    return levels
+
+def prefetch_level(idx):
+    if idx < NUM_LEVELS:
+        assets.claim(f"level{idx+1}", levels[idx].asset_paths)
+        assets.prefetch(levels[idx].asset_paths)
+
+def unload_levels(keep):
+    """Unload sprites and baked backgrounds of the levels not in keep (indices) that no kept level shares."""
+    for idx in range(NUM_LEVELS):
+        if idx not in keep:
+            assets.release(f"level{idx+1}")
+            levels[idx].background.invalidate()
+
+def baked_bytes():
+    """Surfaces made outside the AssetManager: (name, bytes) of the baked backgrounds and rendered text."""
+    return [("Hintergründe", sum(level.background.resident_bytes() for level in levels)),
+            ("Text", text_cache.resident_bytes())]
+
+def print_asset_report(limit=20):
+    rows = assets.report()
+    baked = baked_bytes()
+    total = sum(n for _, n, _, _ in rows) + sum(n for _, n in baked)
+    print(f"Assets: {sum(1 for _, n, _, _ in rows if n)} geladen, {total / 2**20:.1f} MiB, "
+          f"{sum(ms for _, _, ms, _ in rows):.0f} ms Ladezeit")
+    for name, n in baked:
+        print(f"  {n / 2**10:8.0f} KiB {'':11}  {name}")
+    for path, n, ms, owners in rows[:limit]:
+        print(f"  {n / 2**10:8.0f} KiB {ms:8.1f} ms  {path}  [{', '.join(owners)}]")
+
+def camera_x(player_x, level_width):
+    """Camera following the player, clamped to the level. level_width None: endless."""
+    x = player_x + PLAYER_WIDTH//2 - WIDTH//2
+    if level_width is not None:
+        x = min(x, level_width - WIDTH)
+    return max(0, x)
+
+def on_screen(x, w, cam_x):
+    return x + w > cam_x and x < cam_x + WIDTH
 
-    cam_x = max(0, min(player.x + PLAYER_WIDTH//2 - WIDTH//2, LEVEL_WIDTH - WIDTH))
+def clone_clouds(cloud_lists):
+    return [ [c[0], c[1]] for c in cloud_lists[0] ], [ [c[0], c[1]] for c in cloud_lists[1] ]
 
-    # Levelwechsel
-    if not enemy_alive and player.x >= LEVEL_WIDTH and not fight_anim_active:
-        current_level_idx += 1
-        if current_level_idx >= NUM_LEVELS:
-            break
-        level = levels[current_level_idx]
-        obstacles = level.obstacle_factory()
-        enemy = level.boss_factory()
-        enemy_alive = True
-        in_battle = False
-        player.x, player.y = -PLAYER_WIDTH, GROUND_Y - PLAYER_HEIGHT
-        player_vel_y = 0
-        big_clouds, small_clouds = clone_clouds(level.clouds) if level.clouds else ([], [])
-        bg_offset = 0
-        screen.fill(BG_COLOR)
-        txt = font.render(f"Level {current_level_idx+1}", True, TEXT_COLOR)
-        screen.blit(txt, (WIDTH//2 - txt.get_width()//2, HEIGHT//2 - txt.get_height()//2))
-        pygame.display.flip()
-        pygame.time.wait(2000)
-
-    # --- Parallax movement for apartment background ---
-    dx = player.x - old_x
-    if current_level_idx == 0:
-        bg_offset -= dx * 0.7
-        bg_offset = max(min(bg_offset, 200), -200)
-
-    # --- Clouds Parallax Movement ---
-    if level.clouds is not None:
-        for c in big_clouds:
-            c[0] -= dx * 0.5
-            if c[0] - cam_x > WIDTH:
-                c[0] -= LEVEL_WIDTH
-            elif c[0] - cam_x < -200:
-                c[0] += LEVEL_WIDTH
-        for c in small_clouds:
-            c[0] -= dx * (1/3)
-            if c[0] - cam_x > WIDTH:
-                c[0] -= LEVEL_WIDTH
-            elif c[0] - cam_x < -200:
-                c[0] += LEVEL_WIDTH
-
-    # --- Drawing ---
-    if current_level_idx == 0:
-        level.background_draw_func(screen, cam_x, bg_offset)
-    else:
-        level.background_draw_func(screen, cam_x)
-
-    if level.clouds is not None and cloud_img_big:
-        for c in big_clouds:
-            screen.blit(cloud_img_big, (c[0] - cam_x, c[1]))
-    if level.clouds is not None and cloud_img_small:
-        for c in small_clouds:
-            screen.blit(cloud_img_small, (c[0] - cam_x, c[1]))
-
-    # Ground
-    pygame.draw.rect(screen, GROUND_COLOR, (0, GROUND_Y, WIDTH, HEIGHT - GROUND_Y))
-
-    # --- Draw Obstacles ---
-    for o in obstacles:
-        r = o['rect']
-        img = o.get('img')
-        typ = o['type']
-        if img:
-            img_scaled = pygame.transform.scale(img, (r.width, r.height))
-            screen.blit(img_scaled, (r.x - cam_x, r.y))
-        else:
-            color = OBSTACLE_TYPES.get(typ, {}).get("color", (180, 180, 180))
-            pygame.draw.rect(screen, color, (r.x - cam_x, r.y, r.width, r.height))
-
-    # --- Fight Animation ---
-    if fight_anim_active:
-        elapsed = pygame.time.get_ticks() - fight_anim_start
-        frame_duration = fight_anim_duration / fight_anim_total_frames
-        frame_index = int(elapsed // frame_duration)
-        if frame_index >= fight_anim_total_frames:
-            fight_anim_active = False
-            fight_anim_done = True
+# --- Shared sprites ---
+FACINGS = (("r", False), ("l", True))  # facing, frames mirrored
+
+class Sprites:
+    """Sprites used by every level, built once their PNGs are decoded. Surfaces are shared assets.variant()s."""
+    def __init__(self):
+        # Entity frames per (type, facing), types without frames are drawn in their color
+        self.entities = {}
+        for name, e in ENTITY_TYPES.items():
+            for facing, flip in FACINGS:
+                frames = [load_image_safe(p, e["size"], flip) for p in e.get("frames", ())]
+                if frames and all(frames):
+                    self.entities[name, facing] = Clip(frames, e.get("frame_ms", 150))
+        self.cloud_big = load_image_safe(CLOUD_PATH, (120, 60))
+        self.cloud_small = load_image_safe(CLOUD_PATH, (60, 30))
+
+        # Player animation per (state, facing), every frame scaled and mirrored up front
+        crouch_size = (PLAYER_WIDTH, int(PLAYER_HEIGHT * CROUCH_FACTOR))
+        self.player = {}
+        for facing, flip in FACINGS:
+            walk = load_animation_frames(WALK_PATHS, flip_x=flip)
+            self.player.update({
+                ("idle", facing):   Clip(walk[:1], WALK_FRAME_MS),
+                ("walk", facing):   Clip(walk, WALK_FRAME_MS),
+                ("jump", facing):   Clip(load_animation_frames(JUMP_PATHS, flip_x=flip), JUMP_FRAME_MS, loop=False),
+                ("crouch", facing): Clip(load_animation_frames(CROUCH_PATHS, crouch_size, flip), WALK_FRAME_MS),
+            })
+
+        # --- Fight Animation Frames ---
+        self.fight = load_animation_frames(FIGHT_PATHS, (180, 140))
+        assets.trim(STARTUP_ASSETS)  # only the scaled variants above are drawn
+
+# --- World: state of the level being played ---
+class World:
+    def __init__(self, level_idx, sprites, level=None):
+        self.sprites = sprites
+        self.level_idx = level_idx
+        self.level = level or levels[level_idx]
+        self.stream = None
+        if self.level.segments:
+            self.stream = LevelStream(self.level.segments, new_obstacles, add_obstacle, WIDTH, GRID_CELL_SIZE,
+                                      STREAM_AHEAD, STREAM_BEHIND)
         else:
-            # Center between player and enemy, both shifted 30px down
-            px = player.x - cam_x + player.width // 2
-            ex = enemy.x - cam_x + enemy.width // 2
-            py = player.y + player.height // 2 + 10
-            ey = enemy.y + enemy.height // 2 + 10
-            fight_x = (px + ex) // 2 - fight_frames[0].get_width() // 2
-            fight_y = (py + ey) // 2 - fight_frames[0].get_height() // 2
-            fight_img = fight_frames[frame_index % len(fight_frames)]
-            screen.blit(fight_img, (fight_x, fight_y))
-        # Skip all other drawing during fight
-    else:
-        # Gegner/Boss
-        if enemy_alive and enemy:
-            ex, ey = enemy.x - cam_x, enemy.y + 30
-            if current_level_idx == 2:
-                pygame.draw.rect(screen, (40,220,40), (ex, ey, enemy.width, enemy.height))
-            elif enemy_image:
-                screen.blit(enemy_image, (ex, ey))
-            else:
-                pygame.draw.rect(screen, (50,200,50), (ex, ey, ENEMY_WIDTH, ENEMY_HEIGHT))
-        # --- Player Animation ---
-        if player_vel_y != 0:
+            self.obstacles = self.level.obstacle_factory()
+            self.obstacle_grid = SpatialGrid(self.obstacles, GRID_CELL_SIZE)
+        prefetch_level(level_idx + 1)
+        if level is None:
+            unload_levels({level_idx, level_idx + 1})
+        self.entities = self.level.entity_factory()
+
+        self.player = pygame.Rect(-PLAYER_WIDTH, GROUND_Y-PLAYER_HEIGHT, PLAYER_WIDTH, PLAYER_HEIGHT)
+        self.player_vel_y = 0
+        self.ground_y = GROUND_Y
+        self.stream_segments()
+
+        clouds = self.level.clouds
+        self.big_clouds, self.small_clouds = clone_clouds(clouds) if clouds else ([], [])
+        self.bg_offset = 0  # Parallax offset for background layers with shift
+
+        self.animator = Animator(sprites.player, "idle")
+        self.player_image = self.animator.image
+        self.player_draw_y = self.player.y + 30
+        self.settle()
+
+        self.drawn = []  # (key, rect) of changeable things drawn this frame
+        self.fps_time = -FPS_READOUT_MS
+        self.fps_text = None
+
+    @property
+    def cam_x(self):
+        return camera_x(self.player.x, self.level.width)
+
+    @property
+    def level_clear(self):
+        """All fights of the level won."""
+        return not self.entities.remaining(self.entities.battle)
+
+    def settle(self):
+        """Start of a simulation step: remember where things are for interpolation."""
+        self.prev_x, self.prev_y = self.player.x, self.player.y
+        self.entities.settle()
+        self.prev_bg_offset = self.bg_offset
+        self.last_dx = 0
+
+    def view(self, alpha):
+        """
+        Player x/y, camera x and background offset between the previous
+        and the current step (alpha 0..1). Teleports are not smoothed.
+        """
+        x, y = self.player.x, self.player.y
+        if not INTERPOLATE or abs(x - self.prev_x) > WIDTH // 2:
+            return x, y, camera_x(x, self.level.width), self.bg_offset
+        x = round(self.prev_x + (x - self.prev_x) * alpha)
+        y = round(self.prev_y + (y - self.prev_y) * alpha)
+        bg_offset = self.prev_bg_offset + (self.bg_offset - self.prev_bg_offset) * alpha
+        return x, y, camera_x(x, self.level.width), bg_offset
+
+    def stream_segments(self):
+        """Load the segments of a streamed level around the camera, drop those far behind."""
+        if self.stream is not None:
+            with profiler.section("stream"):
+                self.stream.update(self.cam_x)
+            self.obstacles, self.obstacle_grid = self.stream.obstacles, self.stream.grid
+
+    def jump(self):
+        physics.jump(self)
+
+    def step(self, keys):
+        """Move the player and the entities one frame. Returns the entity to fight, or None."""
+        self.settle()
+        self.stream_segments()
+        old_x = self.player.x
+        opponent = physics.step(self, keys[pygame.K_LEFT], keys[pygame.K_RIGHT],
+                                self.obstacles, self.obstacle_grid, self.entities, profiler)
+        with profiler.section("physics"):
+            self.scroll(self.player.x - old_x)
+        return opponent
+
+    def scroll(self, dx):
+        cam_x = self.cam_x
+        self.last_dx = dx
+
+        # --- Parallax offset (apartment furniture) ---
+        self.bg_offset -= dx * 0.7
+        self.bg_offset = max(min(self.bg_offset, BG_PARALLAX_LIMIT), -BG_PARALLAX_LIMIT)
+
+        # --- Clouds Parallax Movement ---
+        # Kept within cloud_span from CLOUD_MARGIN left of the camera, however far it jumped
+        left, span = cam_x - CLOUD_MARGIN, self.level.cloud_span
+        for clouds, factor in ((self.big_clouds, 0.5), (self.small_clouds, 1/3)):
+            for c in clouds:
+                c[0] = left + (c[0] - dx * factor - left) % span
+
+    def animate(self, keys, now):
+        """Pick the player and entity images for this frame."""
+        self.entities.animate(now)
+        if self.player_vel_y != 0:
             state = "jump"
-            if not jump_anim_playing:
-                jump_anim_playing = True
-                jump_anim_progress = 0
         elif keys[pygame.K_DOWN]:
             state = "crouch"
         elif keys[pygame.K_LEFT] or keys[pygame.K_RIGHT]:
             state = "walk"
         else:
             state = "idle"
-        if player_vel_y == 0:
-            jump_anim_playing = False
-
         facing = "l" if keys[pygame.K_LEFT] else "r"
-        if state == "walk":
-            frames = walk_frames_l if facing=="l" else walk_frames_r
-            n_frames = len(frames)
-            if anim_state != state:
-                anim_state = state
-                anim_frame = 0
-                anim_timer = now
-            elif now - anim_timer > 100:
-                anim_timer = now
-                anim_frame = (anim_frame + 1) % n_frames
-            current_image = frames[anim_frame]
-        elif state == "jump":
-            frames = jump_frames_l if facing=="l" else jump_frames_r
-            n_frames = len(frames)
-            if jump_anim_playing:
-                if now - anim_timer > 60 and jump_anim_progress < n_frames - 1:
-                    anim_timer = now
-                    jump_anim_progress += 1
-                current_image = frames[jump_anim_progress]
+        img = self.player_image = self.animator.update(state, facing, now)
+        if state == "crouch":
+            self.player_draw_y = GROUND_Y - img.get_height() + 30  # squashed onto the ground
+        else:
+            self.player_draw_y = self.player.y + 30
+
+    def mark(self, key, rect, activity=True):
+        """
+        Record something drawn this frame that can change without the camera
+        moving. activity=False for readouts that shouldn't keep the game awake.
+        """
+        self.drawn.append((key, pygame.Rect(rect), activity))
+
+    def damage(self, scene, alpha):
+        """Scene.draw() result: what decides a full redraw, and the marked items."""
+        _, _, cam_x, bg_offset = self.view(alpha)
+        return (scene, cam_x, int(bg_offset)), self.drawn
+
+    def draw_scenery(self, screen, alpha=1.0):
+        self.drawn = []
+        _, _, cam_x, bg_offset = self.view(alpha)
+        with profiler.section("background"):
+            self.draw_background(screen, alpha, cam_x, bg_offset)
+        with profiler.section("obstacles"):
+            self.draw_obstacles(screen, cam_x)
+
+    def draw_background(self, screen, alpha, cam_x, bg_offset):
+        self.level.background.draw(screen, cam_x, bg_offset)
+
+        # Clouds moved by -dx * factor in the last step, undo the part not yet reached
+        back = (1 - alpha) * self.last_dx if INTERPOLATE else 0
+        for clouds, img, factor in ((self.big_clouds, self.sprites.cloud_big, 0.5),
+                                    (self.small_clouds, self.sprites.cloud_small, 1/3)):
+            if img:
+                cw = img.get_width()
+                for c in clouds:
+                    cx = c[0] + back * factor
+                    if on_screen(cx, cw, cam_x):
+                        pos = (int(cx - cam_x), c[1])
+                        screen.blit(img, pos)
+                        self.mark(img, (pos, img.get_size()))
+
+        # Ground
+        pygame.draw.rect(screen, GROUND_COLOR, (0, GROUND_Y, WIDTH, HEIGHT - GROUND_Y))
+
+    def draw_obstacles(self, screen, cam_x):
+        # --- Draw Obstacles (only those in the viewport) ---
+        obs = self.obstacles
+        sprites, colors = obs.sprites, obs.colors
+        for i in self.obstacle_grid.query_range(cam_x, cam_x + WIDTH):
+            s = obs.sprite[i]
+            if s >= 0:
+                screen.blit(sprites[s], (obs.x[i] - cam_x, obs.y[i]))
             else:
-                current_image = frames[-1]
-        elif state == "crouch":
-            frames = crouch_frames_l if facing=="l" else crouch_frames_r
-            current_image = frames[0]
-            new_h = int(PLAYER_HEIGHT * CROUCH_FACTOR)
-            current_image = pygame.transform.scale(current_image, (PLAYER_WIDTH, new_h))
-            py = GROUND_Y - new_h + 30
-        else:  # idle
-            frames = [walk_frames_l[0]] if facing=="l" else [walk_frames_r[0]]
-            current_image = frames[0]
-        if state != "crouch":
-            py = player.y + 30
-        screen.blit(current_image, (player.x - cam_x, py))
-
-    # --- UI ---
-    info = font.render(
-        f"Level {current_level_idx+1}/{NUM_LEVELS}  Screen {cam_x//WIDTH+1}/{SCREENS_PER_LEVEL}",
-        True, TEXT_COLOR
-    )
-    screen.blit(info, (10, 10))
-    fps = font.render(f"FPS: {int(clock.get_fps())}", True, TEXT_COLOR)
-    screen.blit(fps, (WIDTH-100, 10))
+                pygame.draw.rect(screen, colors[obs.kind[i]], (obs.x[i] - cam_x, obs.y[i], obs.w[i], obs.h[i]))
+
+    def draw_actors(self, screen, alpha=1.0):
+        x, y, cam_x, _ = self.view(alpha)
+        self.draw_entities(screen, alpha, cam_x)
+        pos = (x - cam_x, self.player_draw_y - self.player.y + y)
+        screen.blit(self.player_image, pos)
+        self.mark(self.player_image, (pos, self.player_image.get_size()))
+
+    def draw_entities(self, screen, alpha, cam_x):
+        ents, clips = self.entities, self.sprites.entities
+        names, colors = ents.names, ents.colors
+        smooth = alpha if INTERPOLATE else 1.0
+        for i in range(len(ents)):
+            if not ents.alive[i]:
+                continue
+            prev = ents.prev_x[i]
+            ex = round(prev + (ents.x[i] - prev) * smooth)
+            w, h = ents.w[i], ents.h[i]
+            if not on_screen(ex, w, cam_x):
+                continue
+            k = ents.kind[i]
+            name = names[k]
+            pos = (ex - cam_x, ents.y[i] + ENTITY_TYPES.get(name, {}).get("dy", 0))
+            clip = clips.get((name, "l" if ents.vx[i] < 0 else "r"))
+            if clip:
+                img = clip.frames[ents.frame[i]]
+                screen.blit(img, pos)
+                self.mark(img, (pos, img.get_size()))  # a new frame or facing is a new surface
+            else:
+                pygame.draw.rect(screen, colors[k], (pos, (w, h)))
+                self.mark(("entity", i), (pos, (w, h)))
+
+    def draw_hud(self, screen):
+        screens = f"/{self.level.screens}" if self.level.screens else ""
+        info = render_text(f"Level {self.level_idx+1}/{NUM_LEVELS}  Screen {self.cam_x//WIDTH+1}{screens}")
+        screen.blit(info, (10, 10))
+        self.mark(info, info.get_rect(topleft=(10, 10)))
+        now = pygame.time.get_ticks()
+        if now - self.fps_time >= FPS_READOUT_MS:
+            self.fps_time = now
+            self.fps_text = render_text(f"FPS: {int(min(clock.get_fps(), 9999))}")
+        screen.blit(self.fps_text, (WIDTH-100, 10))
+        self.mark(self.fps_text, self.fps_text.get_rect(topleft=(WIDTH-100, 10)), activity=False)
+
+# --- Performance tools ---
+class PerfTools:
+    """
+    Debug hotkeys for run(): the overlay, trace dumps, cProfile captures
+    and the asset report.
+    Frames are only timed while the overlay is on or run() was given a
+    profiler, otherwise the sections stay no-ops.
+    """
+    KEYS = (OVERLAY_KEY, TRACE_KEY, CPROFILE_KEY, ASSETS_KEY)
+
+    def __init__(self):
+        self.overlay = None
+        self.capture = CProfileCapture()
+        self.recording = False  # profiler was installed by the overlay
+
+    def _path(self, ext):
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        return os.path.join(PROFILE_DIR, time.strftime(f"%Y%m%d-%H%M%S.{ext}"))
+
+    def handle_key(self, key):
+        global profiler
+        if key == OVERLAY_KEY:
+            if self.overlay is None:
+                self.overlay = PerfOverlay(render_text, 1000 / (FPS or SIM_HZ))
+                if isinstance(profiler, NullProfiler):
+                    profiler = Profiler(PROFILE_HISTORY)
+                    self.recording = True
+            else:
+                self.overlay = None
+                if self.recording:
+                    profiler = NullProfiler()
+                    self.recording = False
+        elif key == TRACE_KEY:
+            if isinstance(profiler, NullProfiler):
+                print(f"Keine Messdaten, erst {pygame.key.name(OVERLAY_KEY)} drücken")
+                return
+            path = self._path("json")
+            profiler.write_json(path)
+            profiler.write_csv(path[:-len("json")] + "csv")
+            print(f"Trace gespeichert: {path}")
+        elif key == CPROFILE_KEY:
+            path = self.capture.toggle(self._path("prof"))
+            print(f"cProfile gespeichert: {path}" if path else "cProfile läuft...")
+        elif key == ASSETS_KEY:
+            print_asset_report()
+
+    def draw(self, screen):
+        """Draw the overlay, returns whether it is shown."""
+        if self.overlay is None:
+            return False
+        with profiler.section("overlay"):
+            self.overlay.draw(screen, profiler, pygame.time.get_ticks())
+        return True
+
+    def close(self):
+        if self.capture.active:
+            print(f"cProfile gespeichert: {self.capture.toggle(self._path('prof'))}")
+
+# --- Scenes ---
+class Scene:
+    """
+    One state of the game loop. The loop feeds it events, then calls
+    update() once per fixed simulation step (now is simulation time in ms,
+    keys the held keys), which returns the scene for the next step (self to
+    stay, None to quit), then draw() once per rendered frame. alpha is how
+    far the frame lies between the last two steps. draw() returns the
+    frame's damage for the Presenter, None meaning everything changed.
+    """
+    def handle_event(self, e):
+        pass
+
+    def update(self, now, keys):
+        return self
+
+    def draw(self, screen, alpha=1.0):
+        return None
+
+class IntroScene(Scene):
+    """Intro text, shown while the shared sprites decode in the background."""
+    LINES = [
+        "Es ist ein ganz normaler Morgen an der Universität.",
+        "Leon macht sich auf den Weg…",
+        "Drücke [Leertaste], um zu starten..."
+    ]
+
+    def __init__(self):
+        self.texts = [render_text(line) for line in self.LINES]
+        self.loading = render_text("Lade…")
+        self.start_pressed = False
 
-    if in_battle and not fight_anim_active:
-        l1 = font.render(f"Level {current_level_idx+1}: Gegner blockiert!", True, TEXT_COLOR)
-        l2 = font.render("[F] kämpfen  [R] fliehen", True, TEXT_COLOR)
-        screen.blit(l1, (50, 150))
-        screen.blit(l2, (50, 180))
+    def handle_event(self, e):
+        if e.type == pygame.KEYDOWN and e.key == pygame.K_SPACE:
+            self.start_pressed = True
 
-    pygame.display.flip()
+    def update(self, now, keys):
+        assets.pump()  # convert whatever the loader thread finished meanwhile
+        if self.start_pressed and assets_ready(STARTUP_ASSETS + levels[0].asset_paths):
+            return PlayingScene(World(0, Sprites()))
+        return self
+
+    def draw(self, screen, alpha=1.0):
+        screen.fill(BG_COLOR)
+        for i, text in enumerate(self.texts):
+            screen.blit(text, (WIDTH//2 - text.get_width()//2, 60 + i*30))
+        if self.start_pressed:
+            screen.blit(self.loading, (WIDTH//2 - self.loading.get_width()//2, 60 + len(self.texts)*30))
+        return (self, self.start_pressed), []
+
+class PlayingScene(Scene):
+    def __init__(self, world):
+        self.world = world
+
+    def handle_event(self, e):
+        if e.type == pygame.KEYDOWN and e.key == pygame.K_SPACE:
+            self.world.jump()
+
+    def update(self, now, keys):
+        world = self.world
+        opponent = world.step(keys)
+        with profiler.section("player"):
+            world.animate(keys, now)
+        if opponent is not None:
+            return BattleScene(world, opponent)
+        # Levelwechsel
+        if world.level_clear and world.level.width is not None and world.player.x >= world.level.width:
+            if world.level_idx + 1 >= NUM_LEVELS:
+                return None
+            return TransitionScene(world.level_idx + 1, world.sprites)
+        return self
+
+    def draw(self, screen, alpha=1.0):
+        self.world.draw_scenery(screen, alpha)
+        with profiler.section("player"):
+            self.world.draw_actors(screen, alpha)
+        with profiler.section("ui"):
+            self.world.draw_hud(screen)
+        return self.world.damage(self, alpha)
+
+class BattleScene(Scene):
+    """Player stands in front of an opponent (entity index): [F] fight, [R] flee."""
+    def __init__(self, world, opponent):
+        self.world = world
+        self.opponent = opponent
+        self.next_scene = self
+        self.prompt = [render_text(f"Level {world.level_idx+1}: Gegner blockiert!"),
+                       render_text("[F] kämpfen  [R] fliehen")]
+
+    def handle_event(self, e):
+        if e.type != pygame.KEYDOWN:
+            return
+        if e.key == pygame.K_f:
+            self.world.entities.kill(self.opponent)
+            self.next_scene = FightScene(self.world, self.opponent)
+        if e.key == pygame.K_r:
+            self.world.player.x = -PLAYER_WIDTH
+            self.next_scene = PlayingScene(self.world)
+
+    def update(self, now, keys):
+        self.world.settle()
+        with profiler.section("player"):
+            self.world.animate(keys, now)
+        return self.next_scene
+
+    def draw(self, screen, alpha=1.0):
+        self.world.draw_scenery(screen, alpha)
+        with profiler.section("player"):
+            self.world.draw_actors(screen, alpha)
+        with profiler.section("ui"):
+            self.world.draw_hud(screen)
+            for i, line in enumerate(self.prompt):
+                screen.blit(line, (50, 150 + i*30))
+        return self.world.damage(self, alpha)
+
+class FightScene(Scene):
+    LOOPS = 5           # Loop through frames 5 times
+    DURATION = 2000     # ms
+
+    def __init__(self, world, opponent):
+        self.world = world
+        self.opponent = opponent
+        frames = world.sprites.fight
+        self.clip = Clip(frames, self.DURATION / (len(frames) * self.LOOPS))
+        self.start = None
+        self.image = frames[0]
+
+    def update(self, now, keys):
+        if self.start is None:
+            self.start = now
+        self.world.settle()
+        if now - self.start >= self.DURATION:
+            return PlayingScene(self.world)
+        self.image = self.clip.frame(now - self.start)
+        return self
+
+    def draw(self, screen, alpha=1.0):
+        world = self.world
+        world.draw_scenery(screen, alpha)
+        # Center between player and enemy, both shifted 30px down
+        x, y, cam_x, _ = world.view(alpha)
+        player, ents, i = world.player, world.entities, self.opponent
+        px = x - cam_x + player.width // 2
+        ex = ents.x[i] - cam_x + ents.w[i] // 2
+        py = y + player.height // 2 + 10
+        ey = ents.y[i] + ents.h[i] // 2 + 10
+        fight_img = self.image
+        fight_x = (px + ex) // 2 - fight_img.get_width() // 2
+        fight_y = (py + ey) // 2 - fight_img.get_height() // 2
+        screen.blit(fight_img, (fight_x, fight_y))
+        world.mark(fight_img, fight_img.get_rect(topleft=(fight_x, fight_y)))
+        # Skip enemy and player during fight
+        with profiler.section("ui"):
+            world.draw_hud(screen)
+        return world.damage(self, alpha)
+
+class TransitionScene(Scene):
+    """'Level N' card, held at least LEVEL_TRANSITION_MS and until the level's assets are decoded."""
+    def __init__(self, level_idx, sprites):
+        self.level_idx = level_idx
+        self.sprites = sprites
+        self.start = None
+        self.text = render_text(f"Level {level_idx+1}")
+        prefetch_level(level_idx)
+
+    def update(self, now, keys):
+        if self.start is None:
+            self.start = now
+        assets.pump()
+        if now - self.start >= LEVEL_TRANSITION_MS and assets_ready(levels[self.level_idx].asset_paths):
+            return PlayingScene(World(self.level_idx, self.sprites))
+        return self
+
+    def draw(self, screen, alpha=1.0):
+        screen.fill(BG_COLOR)
+        screen.blit(self.text, (WIDTH//2 - self.text.get_width()//2, HEIGHT//2 - self.text.get_height()//2))
+        return (self,), []
+
+# --- Main loop ---
+def run(scene=None, inputs=None, max_frames=None, prof=None, dirty=None, render=True):
+    """
+    Drive scenes until the game ends, the window is closed or max_frames
+    frames were rendered. Returns the last scene that ran.
+    Headless runs take exactly one simulation step per frame, uncapped,
+    unless inputs replays recorded frame times. dirty overrides DIRTY_RECTS,
+    render=False only simulates.
+    """
+    global profiler, sync_loading
+    scene = scene or IntroScene()
+    inputs = inputs or LiveInput()
+    sync_loading = inputs.sync_loading
+    profiler = prof or NullProfiler()
+    presenter = Presenter(DIRTY_RECTS if dirty is None else dirty, backend)
+    perf = PerfTools()
+    sim_time = 0     # ms of simulated game time
+    accumulator = 0  # ms of real time not yet simulated
+    frames = 0
+    idle_ms = 0      # real time since the last visible change
+
+    while max_frames is None or frames < max_frames:
+        if headless:
+            fps = 0
+        elif IDLE_FPS and idle_ms >= IDLE_AFTER_MS:
+            fps = IDLE_FPS
+        else:
+            fps = FPS
+        frame_ms = clock.tick(fps)
+        accumulator += inputs.elapsed(STEP_MS if headless else frame_ms)
+        assets.pump(1)  # spread conversion of prefetched images over frames
+
+        # --- Events ---
+        with profiler.section("events"):
+            quit_requested = False
+            events = inputs.poll()
+            for e in events:
+                if e.type in (pygame.QUIT, pygame.WINDOWCLOSE):
+                    quit_requested = True
+                    break
+                if e.type == pygame.KEYDOWN and e.key in PerfTools.KEYS:
+                    perf.handle_key(e.key)
+                    continue
+                scene.handle_event(e)
+            keys = inputs.keys()
+        if quit_requested:
+            break
+
+        # --- Fixed-timestep simulation ---
+        steps = 0
+        next_scene = scene
+        while accumulator >= STEP_MS:
+            sim_time += STEP_MS
+            next_scene = scene.update(sim_time, keys)
+            accumulator -= STEP_MS
+            if next_scene is None:
+                break
+            scene = next_scene
+            steps += 1
+            if steps >= MAX_STEPS_PER_FRAME:
+                accumulator %= STEP_MS  # drop the backlog instead of spiralling
+                break
+        if next_scene is None:
+            break
 
-pygame.quit()
-sys.exit()
+        if render:
+            damage = scene.draw(screen, accumulator / STEP_MS)
+            if perf.draw(screen):
+                damage = None  # the graph changes every frame
+            with profiler.section("flip"):
+                active = presenter.present(damage)
+            idle_ms = 0 if active or events else idle_ms + frame_ms
+        profiler.end_frame()
+        frames += 1
+
+    perf.close()
+    profiler = NullProfiler()
+    sync_loading = False
+    return scene
+
+def outcome(scene):
+    """(level index, player x, player y) of a scene from run(), -1 where it has none."""
+    world = getattr(scene, "world", None)
+    if world is None:
+        return getattr(scene, "level_idx", -1), -1, -1
+    return world.level_idx, world.player.x, world.player.y
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--renderer", choices=sorted(BACKENDS), default=RENDERER)
+    args = parser.parse_args()
+    init(renderer=args.renderer)
+    run()
+    assets.shutdown()
+    pygame.quit()
+    sys.exit()
+
+if __name__ == "__main__":
+    main()
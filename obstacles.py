@@ -0,0 +1,71 @@
+from array import array
+
+DEFAULT_COLOR = (180, 180, 180)
+
+
+class Obstacles:
+    """
+    Level obstacles as parallel arrays, one slot per obstacle:
+    x, y, w, h (array 'i'), kind (array 'B', type code) and sprite
+    (array 'h', index into sprites, -1 = draw the type's color).
+    Per-type data lives in tables indexed by the type code, built from the
+    obstacle type registry: names, colors, deadly flags and effects.
+    Types missing from the registry get a code on first use and no effect.
+    """
+    def __init__(self, registry, effects):
+        self.registry = registry
+        self.effects_by_name = effects
+        self.names = []
+        self.colors = []
+        self.deadly = []
+        self.effects = []
+        self._codes = {}
+        for name in registry:
+            self.code(name)
+
+        self.x = array("i")
+        self.y = array("i")
+        self.w = array("i")
+        self.h = array("i")
+        self.kind = array("B")
+        self.sprite = array("h")
+        self.sprites = []       # shared surfaces, deduplicated
+        self._sprite_ids = {}   # id(surface) -> index
+
+    def code(self, name):
+        code = self._codes.get(name)
+        if code is None:
+            entry = self.registry.get(name, {})
+            code = self._codes[name] = len(self.names)
+            self.names.append(name)
+            self.colors.append(entry.get("color", DEFAULT_COLOR))
+            self.deadly.append(entry.get("deadly", False))
+            self.effects.append(self.effects_by_name.get(entry.get("effect")))
+        return code
+
+    def sprite_index(self, surf):
+        if surf is None:
+            return -1
+        idx = self._sprite_ids.get(id(surf))
+        if idx is None:
+            idx = self._sprite_ids[id(surf)] = len(self.sprites)
+            self.sprites.append(surf)
+        return idx
+
+    def add(self, name, x, y, w, h, surf=None):
+        self.x.append(x)
+        self.y.append(y)
+        self.w.append(w)
+        self.h.append(h)
+        self.kind.append(self.code(name))
+        self.sprite.append(self.sprite_index(surf))
+        return len(self.kind) - 1
+
+    def entry(self, i):
+        """(name, x, y, w, h, surface or None) of obstacle i."""
+        s = self.sprite[i]
+        return (self.names[self.kind[i]], self.x[i], self.y[i], self.w[i], self.h[i],
+                self.sprites[s] if s >= 0 else None)
+
+    def __len__(self):
+        return len(self.kind)
@@ -0,0 +1,47 @@
+import pygame
+
+GRAPH_BG = (0, 0, 0)
+UNDER_BUDGET = (80, 220, 80)
+OVER_BUDGET = (230, 70, 60)
+BUDGET_LINE = (200, 200, 200)
+
+
+class PerfOverlay:
+    """
+    Frame-time graph and per-section breakdown of a Profiler's recent
+    frames. The graph shows one bar per frame, scaled so the frame budget
+    sits at half height. The breakdown text is refreshed every refresh_ms,
+    so it doesn't rasterize new strings each frame.
+    """
+    def __init__(self, render_text, budget_ms, pos=(10, 40), size=(240, 60), refresh_ms=500):
+        self.render_text = render_text
+        self.budget_ms = budget_ms
+        self.rect = pygame.Rect(pos, size)
+        self.refresh_ms = refresh_ms
+        self.lines = []
+        self.updated = None
+
+    def draw(self, screen, profiler, now):
+        r = self.rect
+        screen.fill(GRAPH_BG, r)
+        scale = r.height / (2 * self.budget_ms)
+        frames = profiler.frames
+        start = max(0, len(frames) - r.width)
+        for i in range(start, len(frames)):
+            ms = frames[i].get("frame", 0.0) * 1000
+            h = min(r.height, int(ms * scale))
+            color = UNDER_BUDGET if ms <= self.budget_ms else OVER_BUDGET
+            x = r.x + i - start
+            pygame.draw.line(screen, color, (x, r.bottom - 1), (x, r.bottom - h))
+        budget_y = r.bottom - int(self.budget_ms * scale)
+        pygame.draw.line(screen, BUDGET_LINE, (r.x, budget_y), (r.right - 1, budget_y))
+
+        if self.updated is None or now - self.updated >= self.refresh_ms:
+            self.updated = now
+            averages = profiler.averages(r.width)
+            self.lines = [self.render_text(f"{name:<10} {averages.get(name, 0.0):6.2f} ms")
+                          for name in profiler.sections()]
+        y = r.bottom + 4
+        for line in self.lines:
+            screen.blit(line, (r.x, y))
+            y += line.get_height()
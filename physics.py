@@ -0,0 +1,156 @@
+"""
+Player physics, one fixed simulation step at a time.
+
+Nothing here touches the display, so steps can run in worker processes
+(see batch.py). The player is a body: anything with a pygame.Rect
+`player`, a float `player_vel_y` and the ground line `ground_y` (top of
+the ground, screen y), e.g. main.World or Body.
+"""
+import pygame
+
+from profiler import NullProfiler
+
+GRAVITY = 0.5            # px per step², constants are per simulation step
+JUMP_SPEED = -10
+
+PLAYER_WIDTH, PLAYER_HEIGHT = int(40 * 1.3), int(60 * 1.4)
+PLAYER_SPEED = 5
+
+_NULL_PROFILER = NullProfiler()
+
+
+class Body:
+    """A player without a World, standing at the start of the level on ground_y."""
+    __slots__ = ("player", "player_vel_y", "ground_y")
+
+    def __init__(self, ground_y):
+        self.player = pygame.Rect(-PLAYER_WIDTH, ground_y - PLAYER_HEIGHT, PLAYER_WIDTH, PLAYER_HEIGHT)
+        self.player_vel_y = 0
+        self.ground_y = ground_y
+
+
+# --- Obstacle effects: (body, x, y, w, h, old_y) of the touched obstacle ---
+def effect_spring(body, x, y, w, h, old_y):
+    body.player_vel_y = JUMP_SPEED * 1.5
+    body.player.bottom = y
+
+def effect_platform(body, x, y, w, h, old_y):
+    if old_y + PLAYER_HEIGHT <= y:
+        body.player.bottom = y
+        body.player_vel_y = 0
+
+def effect_water(body, x, y, w, h, old_y):
+    body.player.x -= PLAYER_SPEED * 0.5
+
+def effect_rotating(body, x, y, w, h, old_y):
+    body.player.x -= PLAYER_SPEED * 2
+
+EFFECTS = {
+    "spring":   effect_spring,
+    "platform": effect_platform,
+    "water":    effect_water,
+    "rotating": effect_rotating,
+}
+
+
+def reset(body):
+    """Back to the start, e.g. after touching something deadly."""
+    body.player.x = -PLAYER_WIDTH
+    body.player_vel_y = 0
+
+
+def jump(body):
+    if body.player_vel_y == 0:
+        body.player_vel_y = JUMP_SPEED
+
+
+def step(body, left, right, obstacles, grid, entities, prof=_NULL_PROFILER):
+    """
+    Move entities and the player one step: walk, obstacle push-out,
+    gravity, landing and effects, then entity contact. left/right: held.
+    Returns the index of the entity to fight, or None.
+    """
+    player = body.player
+    old_x, old_y = player.x, player.y
+
+    with prof.section("physics"):
+        entities.move()
+        # Movement
+        if left:
+            player.x = max(-PLAYER_WIDTH, player.x - PLAYER_SPEED)
+        if right:
+            player.x += PLAYER_SPEED
+
+    # Only obstacles near the player; pad covers push-outs within one pass
+    pad = grid.max_width + PLAYER_WIDTH
+
+    with prof.section("collision"):
+        collide_horizontal(body, old_x, obstacles, grid.query(player, pad))
+
+    with prof.section("physics"):
+        # Gravity
+        body.player_vel_y += GRAVITY
+        player.y += body.player_vel_y
+
+    with prof.section("collision"):
+        collide_vertical(body, old_y, obstacles, grid.query(player, pad))
+
+    with prof.section("physics"):
+        # Ground
+        stand_y = body.ground_y - PLAYER_HEIGHT
+        if player.y >= stand_y:
+            player.y = stand_y
+            body.player_vel_y = 0
+
+    with prof.section("collision"):
+        return collide_entities(body, old_y, entities)
+
+
+def collide_horizontal(body, old_x, obs, candidates):
+    player = body.player
+    xs, ys, ws, hs, kind, deadly = obs.x, obs.y, obs.w, obs.h, obs.kind, obs.deadly
+    py, pw, ph = player.y, player.width, player.height
+    for i in candidates:
+        x, y, w, h = xs[i], ys[i], ws[i], hs[i]
+        px = player.x
+        if x < px + pw and px < x + w and y < py + ph and py < y + h:
+            if deadly[kind[i]]:
+                reset(body)
+                break
+            if old_x < px:
+                player.x = x - PLAYER_WIDTH
+            else:
+                player.x = x + w
+
+
+def collide_vertical(body, old_y, obs, candidates):
+    """Landing and per-type effects."""
+    player = body.player
+    xs, ys, ws, hs, kind = obs.x, obs.y, obs.w, obs.h, obs.kind
+    deadly, effects = obs.deadly, obs.effects
+    for i in candidates:
+        x, y, w, h = xs[i], ys[i], ws[i], hs[i]
+        px, py = player.x, player.y
+        if x < px + player.width and px < x + w and y < py + player.height and py < y + h:
+            k = kind[i]
+            if deadly[k]:
+                reset(body)
+                break
+            effect = effects[k]
+            if effect:
+                effect(body, x, y, w, h, old_y)
+
+
+def collide_entities(body, old_y, ents):
+    """Deadly entities and effects of moving obstacles, returns the first fight touched."""
+    for i in ents.touching(body.player):
+        k = ents.kind[i]
+        if ents.battle[k]:
+            return i
+        if ents.deadly[k]:
+            reset(body)
+            return None
+        effect = ents.effects[k]
+        if effect:
+            effect(body, ents.x[i], ents.y[i], ents.w[i], ents.h[i], old_y)
+    return None
@@ -0,0 +1,143 @@
+import cProfile
+import csv
+import json
+import time
+from collections import defaultdict, deque
+
+
+class _Scope:
+    __slots__ = ("totals", "name", "start")
+
+    def __init__(self, totals, name):
+        self.totals = totals
+        self.name = name
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc):
+        self.totals[self.name] += time.perf_counter() - self.start
+
+
+class _NullScope:
+    __slots__ = ()
+
+    def __enter__(self):
+        pass
+
+    def __exit__(self, *exc):
+        pass
+
+
+class NullProfiler:
+    """Default profiler, all calls are no-ops."""
+    _scope = _NullScope()
+
+    def section(self, name):
+        return self._scope
+
+    def end_frame(self):
+        pass
+
+
+class Profiler:
+    """
+    Named timing sections per frame.
+    A section may be entered several times per frame, its times add up.
+    end_frame() stores the frame's totals (seconds) plus the whole frame time.
+    history keeps only the last N frames (ring buffer), None keeps all.
+    """
+    def __init__(self, history=None):
+        self.frames = deque(maxlen=history)  # per frame {name: seconds}
+        self._frame = defaultdict(float)
+        self._scopes = {}
+        self._last = None
+
+    def section(self, name):
+        scope = self._scopes.get(name)
+        if scope is None:
+            scope = self._scopes[name] = _Scope(self._frame, name)
+        return scope
+
+    def end_frame(self):
+        now = time.perf_counter()
+        record = dict(self._frame)
+        self._frame.clear()
+        if self._last is not None:
+            record["frame"] = now - self._last
+        self._last = now
+        self.frames.append(record)
+
+    @property
+    def samples(self):
+        """{name: [seconds, ...]} over the recorded frames."""
+        samples = defaultdict(list)
+        for record in self.frames:
+            for name, t in record.items():
+                samples[name].append(t)
+        return samples
+
+    def sections(self):
+        """Names seen in the recorded frames, in first-seen order, "frame" last."""
+        names = {}
+        for record in self.frames:
+            names.update(dict.fromkeys(record))
+        names.pop("frame", None)
+        return list(names) + ["frame"]
+
+    def averages(self, last=None):
+        """{name: mean milliseconds} over the last frames (all by default)."""
+        records = list(self.frames)[-last:] if last else self.frames
+        totals = defaultdict(float)
+        for record in records:
+            for name, t in record.items():
+                totals[name] += t
+        n = max(1, len(records))
+        return {name: t * 1000 / n for name, t in totals.items()}
+
+    def write_json(self, path):
+        """Recorded frames as {"sections": [...], "frames": [{name: ms}, ...]}."""
+        frames = [{name: t * 1000 for name, t in record.items()} for record in self.frames]
+        with open(path, "w") as f:
+            json.dump({"sections": self.sections(), "frames": frames}, f)
+
+    def write_csv(self, path):
+        """One row per recorded frame, one column per section, milliseconds."""
+        names = self.sections()
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["index"] + names)
+            for i, record in enumerate(self.frames):
+                writer.writerow([i] + [f"{record[n] * 1000:.3f}" if n in record else "" for n in names])
+
+    def percentiles(self, ps=(50, 90, 99)):
+        """{section: {p: milliseconds}}, nearest-rank percentiles."""
+        report = {}
+        for name, values in self.samples.items():
+            values = sorted(values)
+            n = len(values)
+            report[name] = {p: values[min(n - 1, max(0, -(-p * n // 100) - 1))] * 1000
+                            for p in ps}
+        return report
+
+
+class CProfileCapture:
+    """cProfile over a stretch of frames, started and stopped by toggle()."""
+    def __init__(self):
+        self._prof = None
+
+    @property
+    def active(self):
+        return self._prof is not None
+
+    def toggle(self, path):
+        """Start capturing, or stop and write the stats to path. Returns the path once written."""
+        if self._prof is None:
+            self._prof = cProfile.Profile()
+            self._prof.enable()
+            return None
+        self._prof.disable()
+        self._prof.dump_stats(path)
+        self._prof = None
+        return path
@@ -0,0 +1,120 @@
+import pygame
+
+COLORKEY = (255, 0, 255)  # transparent color of keyed sprites, normalize() checks it is unused
+
+
+def normalize(surf):
+    """
+    surf in the display's pixel format with the cheapest blit that keeps
+    its look: convert() when every pixel is opaque, an RLE colorkey when
+    pixels are either opaque or fully transparent, per-pixel alpha only
+    for soft edges. Call after the display mode is set, on finished
+    sprites: RLE surfaces are slow to draw into.
+    """
+    if not surf.get_flags() & pygame.SRCALPHA:
+        return surf.convert()
+    w, h = surf.get_size()
+    solid = pygame.mask.from_surface(surf, 254).count()
+    if solid == w * h:
+        return surf.convert()
+    if solid == pygame.mask.from_surface(surf, 0).count():
+        keyed = pygame.Surface((w, h)).convert()
+        keyed.fill(COLORKEY)
+        keyed.blit(surf, (0, 0))
+        if pygame.mask.from_threshold(keyed, COLORKEY, (1, 1, 1, 255)).count() == w * h - solid:
+            keyed.set_colorkey(COLORKEY, pygame.RLEACCEL)
+            return keyed
+    return surf.convert_alpha()
+
+
+# --- Backends: open() the window and return the surface frames are drawn into ---
+class SurfaceBackend:
+    """Draws into the display surface, shown with display.flip()/update()."""
+    def open(self, size, caption):
+        screen = pygame.display.set_mode(size)
+        pygame.display.set_caption(caption)
+        return screen
+
+    def flip(self):
+        pygame.display.flip()
+
+    def update(self, rects):
+        pygame.display.update(rects)
+
+
+class SDL2Backend:
+    """
+    Draws into an off-screen surface that is uploaded to a streaming
+    texture and shown by a pygame._sdl2 Renderer, by default SDL's
+    software renderer (no GPU on the targets). A hidden 1x1 display mode
+    is kept so convert() still knows the pixel format.
+    """
+    def __init__(self, driver="software"):
+        from pygame._sdl2 import video  # optional, raises ImportError without it
+        self.video = video
+        self.driver = driver
+
+    def open(self, size, caption):
+        video = self.video
+        pygame.display.set_mode((1, 1), pygame.HIDDEN)
+        self.window = video.Window(caption, size)
+        index = next((i for i, d in enumerate(video.get_drivers()) if d.name == self.driver), -1)
+        self.renderer = video.Renderer(self.window, index=index)
+        self.texture = video.Texture(self.renderer, size, streaming=True)
+        self.screen = pygame.Surface(size).convert()
+        return self.screen
+
+    def flip(self):
+        self.texture.update(self.screen)
+        self._present()
+
+    def update(self, rects):
+        bounds = self.screen.get_rect()
+        for rect in rects:
+            rect = rect.clip(bounds)
+            if rect:
+                self.texture.update(self.screen.subsurface(rect), rect)
+        self._present()
+
+    def _present(self):
+        self.texture.draw()
+        self.renderer.present()
+
+
+BACKENDS = {"surface": SurfaceBackend, "sdl2": SDL2Backend}
+
+
+class Presenter:
+    """
+    Pushes finished frames to the display.
+    Scenes describe a frame as (view, items): view is anything whose change
+    means the whole screen moved (camera, parallax, scene), items are
+    (key, rect, activity) for things drawn on top that can change alone.
+    Full mode always flips. Dirty mode flips when the view changed and
+    otherwise only updates the rects of items that appeared, moved or
+    disappeared. A damage of None always means a full flip.
+    """
+    def __init__(self, dirty=False, backend=None):
+        self.dirty = dirty
+        self.backend = backend or SurfaceBackend()
+        self._view = None
+        self._items = set()
+
+    def present(self, damage):
+        """Show the frame, returns whether anything other than passive readouts changed."""
+        if damage is None:
+            self._view = None
+            self.backend.flip()
+            return True
+
+        view, items = damage
+        current = {(key, tuple(rect), activity) for key, rect, activity in items}
+        changed = current ^ self._items
+        moved = view != self._view
+        self._view, self._items = view, current
+
+        if moved or not self.dirty:
+            self.backend.flip()
+        elif changed:
+            self.backend.update([pygame.Rect(rect) for _, rect, _ in changed])
+        return moved or any(activity for _, _, activity in changed)
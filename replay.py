@@ -0,0 +1,78 @@
+"""
+Input recordings.
+
+    python replay.py record out.rpl               # play, save the session on exit
+    python replay.py record out.rpl --playthrough # record bench.PLAYTHROUGH headless
+    python replay.py verify replays/*.rpl         # exit 1 if a replay ends elsewhere
+    python replay.py profile replays/*.rpl        # physics/collision timings per replay
+
+Replays run headless at full speed without rendering and check the
+final level index and player position stored in the recording. Record
+again after changes that are meant to alter gameplay.
+"""
+import argparse
+import sys
+
+import pygame
+
+import main as game
+from inputs import LiveInput, Recorder, Replay, ScriptedInput
+from profiler import Profiler
+
+PERCENTILES = (50, 90, 99)
+
+
+def record(path, playthrough=False):
+    game.init(headless_mode=playthrough)
+    if playthrough:
+        import bench
+        source = ScriptedInput(bench.PLAYTHROUGH)
+    else:
+        source = LiveInput()
+    recorder = Recorder(source, game.GAME_KEYS)
+    result = game.outcome(game.run(inputs=recorder))
+    recorder.save(path, result)
+    print(f"{path}: {len(recorder.held)} frames, level {result[0]+1}, player at {result[1:]}")
+
+
+def play(path, prof=None):
+    """Run a recording headless, returns (recording, outcome)."""
+    replay = Replay(path)
+    last = game.run(inputs=replay, max_frames=len(replay), prof=prof, render=False)
+    return replay, game.outcome(last)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["record", "verify", "profile"])
+    parser.add_argument("paths", nargs="+")
+    parser.add_argument("--playthrough", action="store_true", help="record the scripted bench playthrough")
+    args = parser.parse_args()
+
+    if args.command == "record":
+        record(args.paths[0], args.playthrough)
+        return 0
+
+    game.init(headless_mode=True)
+    failed = False
+    for path in args.paths:
+        prof = Profiler() if args.command == "profile" else None
+        replay, result = play(path, prof)
+        if result != replay.outcome:
+            print(f"FAIL {path}: expected level/x/y {replay.outcome}, got {result}")
+            failed = True
+        else:
+            print(f"ok   {path}: {replay.frames} frames")
+        if prof:
+            report = prof.percentiles(PERCENTILES)
+            for section in ("physics", "collision", "frame"):
+                if section in report:
+                    print(f"     {section:<10}" + "".join(f"  p{p} {report[section][p]:.3f}ms" for p in PERCENTILES))
+
+    game.assets.shutdown()
+    pygame.quit()
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
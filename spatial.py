@@ -0,0 +1,42 @@
+from collections import defaultdict
+
+
+class SpatialGrid:
+    """
+    Broad-phase index for level obstacles: uniform grid of vertical strips.
+    Built over an Obstacles store, insert() adds obstacles appended to it
+    later. query() returns the indices of obstacles near a rect, in store
+    order (collision code relies on it).
+    """
+    def __init__(self, obstacles, cell_size):
+        self.obstacles = obstacles
+        self.cell_size = cell_size
+        self.cells = defaultdict(list)
+        self.max_width = max(obstacles.w, default=0)
+        for i, (x, w) in enumerate(zip(obstacles.x, obstacles.w)):
+            for cx in range(x // cell_size, (x + w - 1) // cell_size + 1):
+                self.cells[cx].append(i)
+
+    def insert(self, i):
+        """Index obstacle i, which must come after every indexed one in the store."""
+        x, w = self.obstacles.x[i], self.obstacles.w[i]
+        self.max_width = max(self.max_width, w)
+        for cx in range(x // self.cell_size, (x + w - 1) // self.cell_size + 1):
+            self.cells[cx].append(i)
+
+    def query_range(self, x0, x1):
+        """Indices of all obstacles that may overlap the x interval [x0, x1)."""
+        first = x0 // self.cell_size
+        last = (x1 - 1) // self.cell_size
+        if first == last:
+            return self.cells.get(first, ())
+        idx = set()
+        for cx in range(first, last + 1):
+            idx.update(self.cells.get(cx, ()))
+        return sorted(idx)
+
+    def query(self, rect, pad=0):
+        return self.query_range(rect.left - pad, rect.right + pad)
+
+    def __len__(self):
+        return len(self.obstacles)
@@ -0,0 +1,66 @@
+from spatial import SpatialGrid
+
+
+class LevelStream:
+    """
+    Obstacles of a level loaded one segment (a screen-wide strip) at a time.
+    source(i) gives segment i's obstacles as (type, x, y, w, h, sprite) tuples
+    with x in [i*segment_width, (i+1)*segment_width), or None past the end
+    of the level. update() keeps the segments from `behind` before the
+    camera to `ahead` past its right edge resident and drops the rest, so
+    memory stays the same however long the level is. Dropped segments are
+    asked for again if the camera comes back, so sources must be
+    deterministic.
+
+    obstacles and grid are the resident segments as a regular Obstacles
+    store and SpatialGrid, in segment order. Loading appends to them,
+    dropping builds new ones, so fetch them again after update().
+    """
+    def __init__(self, source, new_store, add, segment_width, cell_size, ahead=2, behind=1):
+        self.source = source
+        self.new_store = new_store
+        self.add = add  # add(store, type, x, y, w, h, sprite), returns the index
+        self.segment_width = segment_width
+        self.cell_size = cell_size
+        self.ahead = ahead
+        self.behind = behind
+        self.segments = {}  # index -> obstacle tuples, [] past the end
+        self.loads = 0
+        self.peak = 0       # most obstacles resident at once
+        self._rebuild()
+
+    def update(self, cam_x):
+        """Load and drop segments for a camera at cam_x."""
+        sw = self.segment_width
+        first = max(0, cam_x // sw - self.behind)
+        last = (cam_x + sw - 1) // sw + self.ahead
+        stale = [i for i in self.segments if not first <= i <= last]
+        for i in stale:
+            del self.segments[i]
+        if stale:
+            self._rebuild()
+        for i in range(first, last + 1):
+            if i not in self.segments:
+                self._load(i)
+        self.peak = max(self.peak, len(self.obstacles))
+
+    def _load(self, i):
+        entries = self.source(i)
+        self.segments[i] = entries = list(entries) if entries is not None else []
+        self.loads += 1
+        if any(j > i for j in self.segments):
+            self._rebuild()  # came back left of resident segments, keep segment order
+            return
+        for entry in entries:
+            self.grid.insert(self.add(self.obstacles, *entry))
+
+    def _rebuild(self):
+        self.obstacles = obs = self.new_store()
+        for i in sorted(self.segments):
+            for entry in self.segments[i]:
+                self.add(obs, *entry)
+        self.grid = SpatialGrid(obs, self.cell_size)
+
+    def __len__(self):
+        return len(self.obstacles)
+